@@ -10,24 +10,16 @@ from alembic import context
 from sqlalchemy import pool
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
-import ssl
-
 from app.config import settings
+from app.database import normalize_url
 from app.models import Base
 
 config = context.config
 
-# Strip sslmode query param for asyncpg 0.30+ compatibility (same fix as database.py)
-_db_url = settings.DATABASE_URL
-_connect_args: dict = {}
-if "sslmode=" in _db_url:
-    _db_url = _db_url.split("?")[0]
-    _ctx = ssl.create_default_context()
-    _ctx.check_hostname = False
-    _ctx.verify_mode = ssl.CERT_NONE
-    _connect_args["ssl"] = _ctx
-
-config.set_main_option("sqlalchemy.url", _db_url)
+# Translate sslmode for asyncpg 0.30+ compatibility (same helper as database.py)
+_db_url, _connect_args = normalize_url(settings.DATABASE_URL)
+
+config.set_main_option("sqlalchemy.url", _db_url.replace("%", "%%"))
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -0,0 +1,108 @@
+"""initial schema: users, wishlists, items, reservations, contributions
+
+The tables as they were before 001 (no oauth columns or deadline, and
+itemstatus with only active/archived), so `alembic upgrade head` can build
+a database from empty.
+
+Databases created by the app's old startup create_all already have the 001
+schema but no alembic_version row; adopt them with
+`alembic stamp 001_oauth_deadline` and then `alembic upgrade head`.
+
+Revision ID: 000_initial_schema
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "000_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("email", sa.String(320), nullable=False),
+        sa.Column("password_hash", sa.String(128), nullable=False),
+        sa.Column("display_name", sa.String(100), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "wishlists",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "owner_user_id", UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("access_token", sa.String(32), nullable=False),
+        sa.Column("is_public", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_wishlists_access_token", "wishlists", ["access_token"], unique=True)
+
+    op.create_table(
+        "items",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "wishlist_id", UUID(as_uuid=True),
+            sa.ForeignKey("wishlists.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("title", sa.String(500), nullable=False),
+        sa.Column("url", sa.Text(), nullable=True),
+        sa.Column("price_cents", sa.Integer(), nullable=True),
+        sa.Column("currency", sa.String(3), nullable=False),
+        sa.Column("image_url", sa.Text(), nullable=True),
+        # 001 adds 'funded' and 'expired'
+        sa.Column("status", sa.Enum("active", "archived", name="itemstatus"), nullable=False),
+        sa.Column("reserved", sa.Boolean()),
+        sa.Column("reserved_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        "reservations",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "item_id", UUID(as_uuid=True),
+            sa.ForeignKey("items.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column(
+            "reserver_user_id", UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True,
+        ),
+        sa.Column("reserver_display_name", sa.String(100), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        "contributions",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "item_id", UUID(as_uuid=True),
+            sa.ForeignKey("items.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column(
+            "contributor_user_id", UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True,
+        ),
+        sa.Column("contributor_display_name", sa.String(100), nullable=False),
+        sa.Column("amount_cents", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("contributions")
+    op.drop_table("reservations")
+    op.drop_table("items")
+    op.drop_table("wishlists")
+    op.drop_table("users")
+    op.execute("DROP TYPE IF EXISTS itemstatus")
@@ -1,14 +1,14 @@
 """add oauth fields, deadline, itemstatus funded/expired
 
 Revision ID: 001_oauth_deadline
-Revises:
+Revises: 000_initial_schema
 Create Date: 2026-02-16
 """
 from alembic import op
 import sqlalchemy as sa
 
 revision = "001_oauth_deadline"
-down_revision = None
+down_revision = "000_initial_schema"
 branch_labels = None
 depends_on = None
 
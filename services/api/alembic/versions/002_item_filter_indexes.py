@@ -0,0 +1,29 @@
+"""indexes for SQL-level item filtering and sorting
+
+Revision ID: 002_item_filter_indexes
+Revises: 001_oauth_deadline
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "002_item_filter_indexes"
+down_revision = "001_oauth_deadline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # --- items: per-wishlist listing ordered by created_at / price ---
+    op.create_index("ix_items_wishlist_id_created_at", "items", ["wishlist_id", "created_at"])
+    op.create_index("ix_items_wishlist_id_price_cents", "items", ["wishlist_id", "price_cents"])
+
+    # --- child tables: FK lookups used by selectin loads and funding totals ---
+    op.create_index("ix_reservations_item_id", "reservations", ["item_id"])
+    op.create_index("ix_contributions_item_id", "contributions", ["item_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contributions_item_id", table_name="contributions")
+    op.drop_index("ix_reservations_item_id", table_name="reservations")
+    op.drop_index("ix_items_wishlist_id_price_cents", table_name="items")
+    op.drop_index("ix_items_wishlist_id_created_at", table_name="items")
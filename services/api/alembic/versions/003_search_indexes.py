@@ -0,0 +1,51 @@
+"""full-text (tsvector) and trigram (pg_trgm) search indexes
+
+Revision ID: 003_search_indexes
+Revises: 002_item_filter_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "003_search_indexes"
+down_revision = "002_item_filter_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # --- wishlists: owner scoping for search and list_wishlists ---
+    op.create_index("ix_wishlists_owner_user_id", "wishlists", ["owner_user_id"])
+
+    # --- full-text: expressions must match app/routes/search.py::_tsvector ---
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_items_search_tsv ON items USING gin "
+        "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(url, '')))"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_wishlists_search_tsv ON wishlists USING gin "
+        "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))"
+    )
+
+    # --- trigram: substring / ILIKE '%q%' matching and similarity() ranking ---
+    op.execute("CREATE INDEX IF NOT EXISTS ix_items_title_trgm ON items USING gin (title gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_items_url_trgm ON items USING gin (url gin_trgm_ops)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_wishlists_title_trgm ON wishlists USING gin (title gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_wishlists_description_trgm ON wishlists "
+        "USING gin (description gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_wishlists_description_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_wishlists_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_items_url_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_items_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_wishlists_search_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_items_search_tsv")
+    op.drop_index("ix_wishlists_owner_user_id", table_name="wishlists")
+    # pg_trgm is left installed; other objects may depend on it.
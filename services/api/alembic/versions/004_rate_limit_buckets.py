@@ -0,0 +1,29 @@
+"""shared token buckets for rate limiting
+
+Revision ID: 004_rate_limit_buckets
+Revises: 003_search_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "004_rate_limit_buckets"
+down_revision = "003_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # UNLOGGED: buckets are hot, tiny and disposable; skipping WAL keeps the upserts cheap.
+    # A crash just empties the table, which resets everyone's limits.
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        prefixes=["UNLOGGED"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets")
@@ -0,0 +1,36 @@
+"""pre-rendered public wishlist snapshots
+
+Revision ID: 005_wishlist_snapshots
+Revises: 004_rate_limit_buckets
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "005_wishlist_snapshots"
+down_revision = "004_rate_limit_buckets"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "wishlist_snapshots",
+        sa.Column(
+            "wishlist_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("wishlists.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("built_version", sa.BigInteger(), nullable=False, server_default="-1"),
+        sa.Column("body", sa.LargeBinary(), nullable=True),
+        sa.Column("reservers", sa.JSON(), nullable=True),
+        sa.Column("deadline", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("generated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("wishlist_snapshots")
@@ -1,31 +1,38 @@
 import uuid
 from datetime import datetime, timedelta, timezone
+from functools import cache
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 
+@cache
+def _pwd_context():
+    # passlib/bcrypt load on first login/register instead of at import time
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
 def _truncate_for_bcrypt(password: str) -> str:
     return password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(_truncate_for_bcrypt(password))
+    return _pwd_context().hash(_truncate_for_bcrypt(password))
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(_truncate_for_bcrypt(plain), hashed)
+    return _pwd_context().verify(_truncate_for_bcrypt(plain), hashed)
 
 
 def create_access_token(user_id: uuid.UUID) -> str:
@@ -45,10 +52,7 @@ def decode_token(token: str) -> uuid.UUID | None:
         return None
 
 
-async def get_current_user(
-    token: str | None = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> User | None:
+async def _user_from_token(token: str | None, db: AsyncSession) -> User | None:
     if token is None:
         return None
     user_id = decode_token(token)
@@ -58,9 +62,34 @@ async def get_current_user(
     return result.scalar_one_or_none()
 
 
+async def get_current_user(
+    token: str | None = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> User | None:
+    return await _user_from_token(token, db)
+
+
 async def require_user(
     user: User | None = Depends(get_current_user),
 ) -> User:
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     return user
+
+
+# Read-only routes: same lookups through get_read_db, so the whole request can hit a replica
+
+
+async def get_current_user_read(
+    token: str | None = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_db),
+) -> User | None:
+    return await _user_from_token(token, db)
+
+
+async def require_user_read(
+    user: User | None = Depends(get_current_user_read),
+) -> User:
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return user
@@ -0,0 +1,206 @@
+"""HTTP response compression with Accept-Encoding negotiation.
+
+gzip is always available; brotli ("br") and zstd are offered when the
+`brotli` / `zstandard` packages are installed. When the client accepts
+several, zstd is preferred, then br, then gzip, unless its q-values say
+otherwise. Bodies below COMPRESSION_MIN_SIZE are sent as they are.
+
+Routes that serve cached payloads (the public wishlist snapshots) compress
+them once per version through cached() and set Content-Encoding
+themselves; the middleware leaves already-encoded responses alone.
+
+WebSocket frames are compressed by the server's permessage-deflate
+extension (uvicorn --ws-per-message-deflate, see the Dockerfile), not here.
+"""
+import zlib
+from functools import cache, lru_cache
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.cache import TTLCache
+from app.config import settings
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "text/")
+# Server-sent events must reach the client as they are produced
+UNBUFFERED_TYPES = ("text/event-stream",)
+
+# Per-request compression favours speed; cached bodies are compressed once, so harder
+DYNAMIC_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+CACHED_LEVELS = {"gzip": 9, "br": 9, "zstd": 12}
+
+
+@cache
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+@cache
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+@cache
+def available() -> tuple[str, ...]:
+    """Supported encodings, most preferred first."""
+    return tuple(
+        name for name, ok in (("zstd", _zstd() is not None), ("br", _brotli() is not None), ("gzip", True))
+        if ok
+    )
+
+
+# Bounded: the key is a raw client header, and browsers send only a handful of distinct ones
+@lru_cache(maxsize=128)
+def negotiate(accept_encoding: str) -> str | None:
+    """The encoding to use for a request's Accept-Encoding header, or None for identity."""
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in available():
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    if level is None:
+        level = DYNAMIC_LEVELS[encoding]
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "br":
+        return _brotli().compress(data, quality=level)
+    return _zstd().ZstdCompressor(level=level).compress(data)
+
+
+_compressed = TTLCache[tuple, bytes](maxsize=settings.COMPRESSION_CACHE_SIZE, ttl=3600)
+
+
+def cached(key: tuple, data: bytes, encoding: str) -> bytes:
+    """`data` compressed with `encoding`, computed once per (key, encoding)."""
+    entry = _compressed.get((key, encoding))
+    if entry is None:
+        entry = compress(data, encoding, CACHED_LEVELS[encoding])
+        _compressed.set((key, encoding), entry)
+    return entry
+
+
+def clear() -> None:
+    _compressed.clear()
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk so streams stay live."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        level = DYNAMIC_LEVELS[encoding]
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._obj = _brotli().Compressor(quality=level)
+        else:
+            self._obj = _zstd().ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(_zstd().COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.compress(data) + self._obj.flush()
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.finish()
+        return self._obj.compress(data) + self._obj.flush()
+
+
+class CompressionMiddleware:
+    """Compresses compressible HTTP responses of at least `minimum_size` bytes.
+
+    Plain ASGI: whole bodies are compressed in one go, streamed bodies chunk
+    by chunk. Responses that already carry a Content-Encoding pass through.
+    """
+
+    def __init__(self, app: ASGIApp, *, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        stream: _StreamCompressor | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(UNBUFFERED_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message  # held until the first body chunk shows the size
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    start, passthrough = None, True
+                    return
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["Content-Length"]
+                    stream = _StreamCompressor(encoding)
+                    body = stream.chunk(body)
+                else:
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            elif stream is not None:
+                body = stream.chunk(body) if more_body else stream.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,23 +1,285 @@
+import itertools
+import logging
+import math
 import ssl
+import time
+import uuid
 
+from fastapi import Response
+from fastapi.requests import HTTPConnection
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Mapper, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
+from app import metrics
+from app.cache import TTLCache
 from app.config import settings
 
-# asyncpg 0.30+ removed the 'sslmode' query param; strip it and pass ssl=True instead
-_url = settings.DATABASE_URL
-_connect_args: dict = {}
-if "sslmode=" in _url:
-    _url = _url.split("?")[0]  # drop all query params
-    _ctx = ssl.create_default_context()
-    _ctx.check_hostname = False
-    _ctx.verify_mode = ssl.CERT_NONE
-    _connect_args["ssl"] = _ctx
+logger = logging.getLogger(__name__)
 
-engine = create_async_engine(_url, echo=False, pool_pre_ping=True, connect_args=_connect_args)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+class PoolStats:
+    """Counters for connection checkouts; read by pool_stats()."""
 
-async def get_db() -> AsyncSession:  # type: ignore[misc]
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+
+    def record(self, wait_s: float) -> None:
+        self.checkouts += 1
+        self.wait_s_total += wait_s
+        if wait_s > self.wait_s_max:
+            self.wait_s_max = wait_s
+
+
+_pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited (incl. pre-ping)."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            _pool_stats.timeouts += 1
+            raise
+        _pool_stats.record(time.perf_counter() - start)
+        return conn
+
+
+def _ssl_context(sslmode: str, query: dict[str, str]) -> ssl.SSLContext | None:
+    if sslmode == "disable":
+        return None
+    ctx = ssl.create_default_context(cafile=query.get("sslrootcert"))
+    if sslmode != "verify-full":
+        ctx.check_hostname = False
+    if sslmode not in ("verify-ca", "verify-full"):
+        ctx.verify_mode = ssl.CERT_NONE
+    if "sslcert" in query:
+        ctx.load_cert_chain(query["sslcert"], query.get("sslkey"))
+    return ctx
+
+
+# URL query params the asyncpg dialect hands to asyncpg.connect() or handles itself
+_ASYNCPG_PARAMS = {
+    "passfile", "timeout", "statement_cache_size", "max_cached_statement_lifetime",
+    "max_cacheable_statement_size", "command_timeout", "direct_tls", "target_session_attrs",
+    "krbsrvname", "gsslib", "prepared_statement_cache_size",
+}
+# libpq params with no asyncpg equivalent; dropped so they don't fail the connect
+_LIBPQ_IGNORED = {"channel_binding", "gssencmode", "sslcompression", "sslcrl", "sslpassword", "keepalives"}
+
+
+def normalize_url(url: str) -> tuple[str, dict]:
+    """Translate libpq-style query params (e.g. Neon/Supabase URLs) into asyncpg options.
+
+    - sslmode (+ sslrootcert, sslcert, sslkey) becomes an `ssl` context
+    - application_name and options become server_settings, connect_timeout `timeout`
+    - params asyncpg.connect() accepts are kept in the URL; any others are dropped
+      with a warning, since asyncpg rejects unknown keyword arguments
+    """
+    connect_args: dict = {}
+    parsed = make_url(url)
+    query = {k: v[-1] if isinstance(v, tuple) else v for k, v in parsed.query.items()}
+    drop: list[str] = []
+    if "sslmode" in query:
+        ctx = _ssl_context(query["sslmode"], query)
+        if ctx is not None:
+            connect_args["ssl"] = ctx
+    drop += [k for k in ("sslmode", "sslrootcert", "sslcert", "sslkey") if k in query]
+    if parsed.get_driver_name() == "asyncpg":
+        server_settings = {k: query[k] for k in ("application_name", "options") if k in query}
+        if server_settings:
+            connect_args["server_settings"] = server_settings
+        if "connect_timeout" in query:
+            connect_args["timeout"] = float(query["connect_timeout"])
+        for key in query:
+            if key in ("application_name", "options", "connect_timeout"):
+                drop.append(key)
+            elif key not in _ASYNCPG_PARAMS and key not in drop:
+                if key not in _LIBPQ_IGNORED:
+                    logger.warning("Ignoring database URL parameter %r: not supported by asyncpg", key)
+                drop.append(key)
+    if drop:
+        url = parsed.difference_update_query(drop).render_as_string(hide_password=False)
+    return url, connect_args
+
+
+def _engine_options(url: str) -> tuple[str, dict]:
+    url, connect_args = normalize_url(url)
+    options: dict = {"echo": False, "connect_args": connect_args}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return url, options
+
+    pooled = settings.DB_POOLER_MODE == "transaction"
+    if pooled:
+        # The external pooler multiplexes server connections; holding our own
+        # idle connections would only pin pooler slots.
+        options.update(poolclass=NullPool)
+    else:
+        options.update(
+            poolclass=InstrumentedPool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_S,
+            pool_recycle=settings.DB_POOL_RECYCLE_S,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    if parsed.get_driver_name() == "asyncpg":
+        cache_size = 0 if pooled else settings.DB_STATEMENT_CACHE_SIZE
+        # SQLAlchemy's own prepared statement cache is configured through the URL
+        url = parsed.update_query_dict(
+            {"prepared_statement_cache_size": str(cache_size)}
+        ).render_as_string(hide_password=False)
+        connect_args["statement_cache_size"] = cache_size
+        if pooled:
+            # Names must not collide when the pooler hands us another client's server connection
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        if settings.DB_COMMAND_TIMEOUT_S:
+            connect_args["command_timeout"] = settings.DB_COMMAND_TIMEOUT_S
+        if settings.DB_STATEMENT_TIMEOUT_MS and not pooled:
+            # Poolers reject unknown startup parameters; set statement_timeout on the role instead
+            connect_args.setdefault("server_settings", {})["statement_timeout"] = str(
+                settings.DB_STATEMENT_TIMEOUT_MS
+            )
+    return url, options
+
+
+# ── Per-request query instrumentation (see app/metrics.py) ──
+# Registered on the Engine class so the primary, replicas and test engines are all covered.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if metrics.current() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = metrics.current()
+    starts = conn.info.get("query_start")
+    if stats is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.db_s += elapsed
+    stats.queries += 1
+    if stats.statements is not None:
+        stats.statements.append((elapsed, statement))
+    # asyncpg reports the row count of SELECTs too; sqlite only for DML
+    if cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+@event.listens_for(Mapper, "load")
+def _count_orm_load(target, context):
+    stats = metrics.current()
+    if stats is not None:
+        stats.orm_objects += 1
+
+
+class PrimarySession(Session):
+    """Sync session class behind primary AsyncSessions; commits pin the client to the primary."""
+
+
+_url, _options = _engine_options(settings.DATABASE_URL)
+engine = create_async_engine(_url, **_options)
+async_session = async_sessionmaker(
+    engine, class_=AsyncSession, sync_session_class=PrimarySession, expire_on_commit=False
+)
+
+replica_engines = [
+    create_async_engine(url, **options)
+    for url, options in (
+        _engine_options(u.strip()) for u in settings.DATABASE_REPLICA_URLS.split(",") if u.strip()
+    )
+]
+replica_sessions = [
+    async_sessionmaker(e, class_=AsyncSession, expire_on_commit=False) for e in replica_engines
+]
+_replica_rr = itertools.count()
+
+# client key -> True while the client must read its own writes from the primary.
+# Only this worker sees it; the PIN_COOKIE below carries the pin to other workers.
+_primary_pins = TTLCache[str, bool](maxsize=100_000, ttl=settings.READ_YOUR_WRITES_PIN_S)
+# Set on responses to writes: the commit time in ms, checked by read_sessionmaker_for
+PIN_COOKIE = "primary_pin"
+
+
+def _client_key(conn: HTTPConnection) -> str:
+    # The bearer token identifies the user's session without decoding it here
+    auth = conn.headers.get("authorization")
+    if auth:
+        return auth
+    return conn.client.host if conn.client else ""
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _pin_after_commit(session: Session) -> None:
+    key = session.info.get("client_key")
+    if key is not None:
+        _primary_pins.set(key, True)
+    response: Response | None = session.info.get("response")
+    if response is not None and replica_sessions:
+        response.set_cookie(
+            PIN_COOKIE,
+            str(int(time.time() * 1000)),
+            max_age=math.ceil(settings.READ_YOUR_WRITES_PIN_S),
+            httponly=True,
+            secure=True,
+            samesite="none",  # the web app calls the API cross-site, with credentials
+        )
+
+
+def _pinned(pinned_at: str | None) -> bool:
+    try:
+        return time.time() * 1000 - int(pinned_at) < settings.READ_YOUR_WRITES_PIN_S * 1000
+    except (TypeError, ValueError):
+        return False
+
+
+def read_sessionmaker_for(client_key: str, pinned_at: str | None = None) -> async_sessionmaker:
+    """Round-robin replica, or the primary if none are configured or the client just wrote.
+
+    A write pins the client on the worker that served it and through PIN_COOKIE
+    (`pinned_at`), which reaches whichever worker or instance serves the next read.
+    """
+    if not replica_sessions or client_key in _primary_pins or _pinned(pinned_at):
+        return async_session
+    return replica_sessions[next(_replica_rr) % len(replica_sessions)]
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats: dict = {
+        "checkouts": _pool_stats.checkouts,
+        "timeouts": _pool_stats.timeouts,
+        "wait_s_total": round(_pool_stats.wait_s_total, 6),
+        "wait_s_max": round(_pool_stats.wait_s_max, 6),
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    return stats
+
+
+async def get_db(conn: HTTPConnection, response: Response) -> AsyncSession:  # type: ignore[misc]
     async with async_session() as session:
+        session.info["client_key"] = _client_key(conn)
+        session.info["response"] = response
+        yield session
+
+
+async def get_read_db(conn: HTTPConnection) -> AsyncSession:  # type: ignore[misc]
+    """Session for read-only routes; may be served by a replica (see read_sessionmaker_for)."""
+    async with read_sessionmaker_for(_client_key(conn), conn.cookies.get(PIN_COOKIE))() as session:
         yield session
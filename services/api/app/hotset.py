@@ -0,0 +1,279 @@
+"""Live in-memory state for the most viewed public wishlists ("hot set").
+
+When a public list goes viral, every viewer's GET rebuilds the same wishlist
+from the database. Lists read more than HOT_WISHLISTS_PROMOTE_RPS times per
+second (on this worker) are promoted: the wishlist and its items are loaded
+once into compact __slots__ records indexed by item id, and the public route
+renders from them without touching the database.
+
+Writes still commit to the database first. The item routes then apply the
+committed rows here, next to their WS broadcast, so this worker's copy never
+lags its own writes. Copies are loaded from the primary, so a reload never
+replaces write-through state with older replica rows. Item writes served by
+other workers show up when the copy is reloaded, at most
+HOT_WISHLISTS_REFRESH_S later; visibility is not cached: the public route
+re-checks is_public in the database on every hot read. Lists whose read rate
+falls below half the promotion threshold are demoted; at most HOT_WISHLISTS_MAX
+lists are held, least recently read first out.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import lazyload, selectinload
+
+from app import database
+from app.cache import TTLCache
+from app.config import settings
+from app.models import Item, Wishlist
+
+RATE_WINDOW_S = 10.0
+
+# Sessions for loading hot copies (the primary, not a replica); tests point this at their own engine
+sessionmaker: async_sessionmaker = database.async_session
+
+
+class _Record:
+    """Copies its slots from an ORM object; subclasses add derived fields."""
+
+    __slots__ = ()
+    _copied: tuple[str, ...] = ()
+
+    @classmethod
+    def copy(cls, obj):
+        record = cls.__new__(cls)
+        for name in cls._copied:
+            setattr(record, name, getattr(obj, name))
+        return record
+
+
+class HotReservation(_Record):
+    __slots__ = _copied = ("id", "reserver_user_id", "reserver_display_name", "created_at")
+
+
+class HotContribution(_Record):
+    __slots__ = _copied = ("id", "contributor_display_name", "amount_cents", "created_at")
+
+
+class HotItem(_Record):
+    _copied = (
+        "id", "wishlist_id", "title", "url", "price_cents", "currency", "image_url",
+        "status", "reserved", "reserved_at", "created_at",
+    )
+    __slots__ = _copied + ("reservations", "contributions", "total_contributed")
+
+    reservations: list[HotReservation]
+    contributions: list[HotContribution]
+    total_contributed: int
+
+    @classmethod
+    def copy(cls, item: Item) -> "HotItem":
+        record = super().copy(item)
+        record.reservations = [HotReservation.copy(r) for r in item.reservations]
+        record.contributions = [HotContribution.copy(c) for c in item.contributions]
+        record.total_contributed = sum(c.amount_cents for c in record.contributions)
+        return record
+
+    def sort_key(self) -> tuple[datetime, uuid.UUID]:
+        # Same order as the default public listing: created_at, then id
+        return self.created_at, self.id
+
+
+class HotWishlist(_Record):
+    _copied = (
+        "id", "owner_user_id", "title", "description", "access_token", "is_public", "deadline", "created_at",
+    )
+    __slots__ = _copied + ("items", "loaded_at", "stale")
+
+    items: dict[uuid.UUID, HotItem]
+    loaded_at: float
+    stale: bool
+
+    @classmethod
+    def copy(cls, wl: Wishlist, items: list[Item] = ()) -> "HotWishlist":
+        record = super().copy(wl)
+        record.items = {i.id: HotItem.copy(i) for i in items}
+        record.loaded_at = time.monotonic()
+        record.stale = False
+        return record
+
+    def upsert(self, item: Item) -> None:
+        hot = HotItem.copy(item)
+        in_order = item.id in self.items or not self.items or (
+            hot.sort_key() >= next(reversed(self.items.values())).sort_key()
+        )
+        self.items[item.id] = hot
+        if not in_order:
+            self.items = dict(sorted(self.items.items(), key=lambda kv: kv[1].sort_key()))
+
+
+class _Rate:
+    __slots__ = ("window_start", "count", "last_rps")
+
+    def __init__(self, now: float) -> None:
+        self.window_start = now
+        self.count = 0
+        self.last_rps = 0.0
+
+
+class HotSet:
+    def __init__(self, *, max_lists: int, promote_rps: float, refresh_s: float) -> None:
+        self.max_lists = max_lists
+        self.promote_rps = promote_rps
+        self.refresh_s = refresh_s
+        self._lists: OrderedDict[uuid.UUID, HotWishlist] = OrderedDict()
+        self._rates = TTLCache[uuid.UUID, _Rate](maxsize=50_000, ttl=RATE_WINDOW_S * 3)
+        # In-flight loads; concurrent readers of a list being (re)loaded wait for the one load
+        self._loading: dict[uuid.UUID, asyncio.Future] = {}
+        # Lists written to while a load was in flight; the loaded rows may predate the write
+        self._raced: set[uuid.UUID] = set()
+        self.hits = 0
+        self.loads = 0
+        self.promotions = 0
+        self.demotions = 0
+
+    def _rate(self, wishlist_id: uuid.UUID) -> float:
+        """Count one read and return the list's read rate in requests per second."""
+        now = time.monotonic()
+        rate = self._rates.get(wishlist_id)
+        if rate is None:
+            rate = _Rate(now)
+            self._rates.set(wishlist_id, rate)
+        elif now - rate.window_start >= RATE_WINDOW_S:
+            rate.last_rps = rate.count / (now - rate.window_start)
+            rate.window_start, rate.count = now, 0
+            self._rates.set(wishlist_id, rate)
+        rate.count += 1
+        # The running window counts too, so a sudden spike promotes without waiting it out
+        return max(rate.last_rps, rate.count / RATE_WINDOW_S)
+
+    async def read(self, wishlist_id: uuid.UUID) -> HotWishlist | None:
+        """The in-memory copy of a hot list, or None if the caller should query the database."""
+        rps = self._rate(wishlist_id)
+        hot = self._lists.get(wishlist_id)
+        if hot is None:
+            if rps < self.promote_rps:
+                return None
+            self.promotions += 1
+            self._demote_idle()
+        elif rps < self.promote_rps / 2:
+            self.evict(wishlist_id)
+            self.demotions += 1
+            return None
+        if hot is None or hot.stale or time.monotonic() - hot.loaded_at >= self.refresh_s:
+            hot = await self._load(wishlist_id)
+        else:
+            self.hits += 1
+        if wishlist_id in self._lists:
+            self._lists.move_to_end(wishlist_id)
+        return hot
+
+    async def _load(self, wishlist_id: uuid.UUID) -> HotWishlist | None:
+        pending = self._loading.get(wishlist_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[wishlist_id] = future
+        self._raced.discard(wishlist_id)
+        hot = None
+        try:
+            async with sessionmaker() as db:
+                hot = await _fetch(db, wishlist_id)
+            if hot is None:
+                self._lists.pop(wishlist_id, None)
+            else:
+                hot.stale = wishlist_id in self._raced
+                self._lists[wishlist_id] = hot
+                while len(self._lists) > self.max_lists:
+                    self._lists.popitem(last=False)
+                    self.demotions += 1
+            self.loads += 1
+            return hot
+        finally:
+            del self._loading[wishlist_id]
+            self._raced.discard(wishlist_id)
+            # Waiters get None on failure and fall back to the database
+            future.set_result(hot)
+
+    def _demote_idle(self) -> None:
+        for wishlist_id in list(self._lists):
+            rate = self._rates.get(wishlist_id)
+            if rate is None or time.monotonic() - rate.window_start >= 2 * RATE_WINDOW_S:
+                self.evict(wishlist_id)
+                self.demotions += 1
+
+    # ── Write-through from the item routes ───────────
+    def apply(self, wishlist_id: uuid.UUID, items: list[Item]) -> None:
+        """Fold freshly committed items (relationships loaded) into a hot list."""
+        hot = self._hot_for_write(wishlist_id)
+        if hot is None:
+            return
+        for item in items:
+            if item.wishlist_id == wishlist_id:
+                hot.upsert(item)
+            else:
+                hot.items.pop(item.id, None)  # moved to another list
+
+    def remove(self, wishlist_id: uuid.UUID, item_ids: list[uuid.UUID]) -> None:
+        hot = self._hot_for_write(wishlist_id)
+        if hot is None:
+            return
+        for item_id in item_ids:
+            hot.items.pop(item_id, None)
+
+    def _hot_for_write(self, wishlist_id: uuid.UUID) -> HotWishlist | None:
+        if wishlist_id in self._loading:
+            self._raced.add(wishlist_id)
+            return None
+        return self._lists.get(wishlist_id)
+
+    def evict(self, wishlist_id: uuid.UUID) -> None:
+        self._lists.pop(wishlist_id, None)
+
+    def clear(self) -> None:
+        self._lists.clear()
+        self._rates.clear()
+
+    def stats(self) -> dict:
+        return {
+            "lists": len(self._lists),
+            "items": sum(len(h.items) for h in self._lists.values()),
+            "hits": self.hits,
+            "loads": self.loads,
+            "promotions": self.promotions,
+            "demotions": self.demotions,
+        }
+
+
+async def _fetch(db: AsyncSession, wishlist_id: uuid.UUID) -> HotWishlist | None:
+    result = await db.execute(
+        select(Wishlist).where(Wishlist.id == wishlist_id).options(lazyload(Wishlist.items))
+    )
+    wl = result.scalar_one_or_none()
+    if wl is None:
+        return None
+    result = await db.execute(
+        select(Item)
+        .where(Item.wishlist_id == wishlist_id)
+        .options(selectinload(Item.reservations), selectinload(Item.contributions))
+        .order_by(Item.created_at, Item.id)
+    )
+    return HotWishlist.copy(wl, result.scalars().all())
+
+
+def funding_total(item: Item | HotItem) -> int:
+    """Sum of contributions; hot records keep it as a running total."""
+    if isinstance(item, HotItem):
+        return item.total_contributed
+    return sum(c.amount_cents for c in item.contributions)
+
+
+hot_set = HotSet(
+    max_lists=settings.HOT_WISHLISTS_MAX,
+    promote_rps=settings.HOT_WISHLISTS_PROMOTE_RPS,
+    refresh_s=settings.HOT_WISHLISTS_REFRESH_S,
+)
@@ -1,24 +1,42 @@
+import secrets
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy import text
 
 from app.config import settings
-from app.database import engine
+from app import compression, hotset, metrics, profiling, resolver
+from app.database import engine, pool_stats
 from app.models import Base
-from app.routes import auth, items, scrape, upload, wishlists, ws
+from app.schema import is_current, verify
+from app.routes import admin, auth, events, items, scrape, search, upload, wishlists, ws
+from app.ws_manager import manager
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup (for dev; use alembic in prod)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if settings.DB_SCHEMA_MODE == "verify":
+        # Migrations are a deploy step; workers only check they ran
+        async with engine.connect() as conn:
+            await verify(conn)
+    elif settings.DB_SCHEMA_MODE == "create_all":
+        # Local dev: create tables from the models, unless alembic already manages them
+        async with engine.connect() as conn:
+            schema_current = await is_current(conn)
+        if not schema_current:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
     yield
 
 
-app = FastAPI(title="Wishlist API", version="0.1.0", lifespan=lifespan)
+app = FastAPI(
+    title="Wishlist API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=metrics.TimedJSONResponse,
+)
 
 # CORS
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",")]
@@ -28,7 +46,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(compression.CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+if settings.METRICS_ENABLED:
+    app.add_middleware(
+        metrics.MetricsMiddleware,
+        server_timing=settings.SERVER_TIMING_ENABLED,
+        slow_request_ms=settings.SLOW_REQUEST_MS,
+    )
+if settings.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # Routes
 app.include_router(auth.router)
@@ -37,8 +66,67 @@ app.include_router(items.router)
 app.include_router(scrape.router)
 app.include_router(ws.router)
 app.include_router(upload.router)
+app.include_router(search.router)
+app.include_router(events.router)
+app.include_router(admin.router)
 
 
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+def require_metrics_token(authorization: str | None = Header(default=None)) -> None:
+    # Like require_admin: 404 while no token is configured, so the routes stay invisible
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = authorization[7:] if authorization and authorization.lower().startswith("bearer ") else ""
+    if not secrets.compare_digest(token, settings.METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+
+
+@app.get("/api/health/db-pool", dependencies=[Depends(require_metrics_token)])
+async def health_db_pool():
+    return pool_stats()
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    pool = pool_stats()
+    ws_stats = manager.stats()
+    tokens = resolver.stats()
+    hot = hotset.hot_set.stats()
+    gauges = {
+        "hot_wishlists": hot["lists"],
+        "hot_wishlist_items": hot["items"],
+        "public_token_cache_size": tokens["size"],
+        "db_pool_checked_out": pool.get("checked_out", 0),
+        "db_pool_checked_in": pool.get("checked_in", 0),
+        "db_pool_overflow": pool.get("overflow", 0),
+        "db_pool_checkout_wait_seconds_max": pool["wait_s_max"],
+        "ws_connections": ws_stats["connections"],
+        "ws_wishlists": ws_stats["wishlists"],
+        "ws_max_connections_per_wishlist": ws_stats["max_connections_per_wishlist"],
+        "ws_client_ips": ws_stats["client_ips"],
+        "ws_replay_wishlists": ws_stats["replay_wishlists"],
+    }
+    counters = {
+        "hot_wishlist_hits_total": hot["hits"],
+        "hot_wishlist_loads_total": hot["loads"],
+        "hot_wishlist_promotions_total": hot["promotions"],
+        "hot_wishlist_demotions_total": hot["demotions"],
+        "public_token_cache_hits_total": tokens["hits"],
+        "public_token_cache_misses_total": tokens["misses"],
+        "db_pool_checkouts_total": pool["checkouts"],
+        "db_pool_timeouts_total": pool["timeouts"],
+        "db_pool_checkout_wait_seconds_total": pool["wait_s_total"],
+        "ws_events_received_total": ws_stats["events_received"],
+        "ws_events_suppressed_total": ws_stats["events_suppressed"],
+        "ws_messages_sent_total": ws_stats["messages_sent"],
+    }
+    return PlainTextResponse(
+        metrics.render_prometheus(gauges, counters),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
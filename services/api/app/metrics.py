@@ -0,0 +1,227 @@
+"""In-process request metrics: per-request counters, per-route aggregates, Prometheus output.
+
+Counters live in the worker that served the request; scrape every worker (or
+aggregate at the proxy) for a full picture.
+"""
+import logging
+import time
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    """Work done while serving one request; filled in by the engine/ORM hooks in database.py."""
+
+    __slots__ = ("db_s", "queries", "rows", "orm_objects", "serialize_s", "statements")
+
+    def __init__(self, capture_sql: bool = False) -> None:
+        self.db_s = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.orm_objects = 0
+        self.serialize_s = 0.0
+        # (seconds, SQL) per statement; only kept when slow-request logging is on
+        self.statements: list[tuple[float, str]] | None = [] if capture_sql else None
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current() -> RequestStats | None:
+    """Stats of the request being served, or None outside of a request."""
+    return _current.get()
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        out, total = [], 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            out.append((f"{bound:g}", total))
+        out.append(("+Inf", self.count))
+        return out
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "db_s", "queries", "rows", "orm_objects", "serialize_s")
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.db_s = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.orm_objects = 0
+        self.serialize_s = 0.0
+
+
+# (method, route template, status) -> aggregates
+routes: dict[tuple[str, str, int], RouteMetrics] = {}
+ws_broadcast_latency = Histogram()
+
+
+def observe_request(method: str, route: str, status: int, wall_s: float, stats: RequestStats) -> None:
+    metrics = routes.get((method, route, status))
+    if metrics is None:
+        metrics = routes[(method, route, status)] = RouteMetrics()
+    metrics.latency.observe(wall_s)
+    metrics.db_s += stats.db_s
+    metrics.queries += stats.queries
+    metrics.rows += stats.rows
+    metrics.orm_objects += stats.orm_objects
+    metrics.serialize_s += stats.serialize_s
+
+
+def server_timing(wall_s: float, stats: RequestStats) -> str:
+    return (
+        f'app;dur={wall_s * 1000:.1f}, '
+        f'db;dur={stats.db_s * 1000:.1f};desc="{stats.queries} queries, {stats.rows} rows", '
+        f'orm;desc="{stats.orm_objects} objects", '
+        f'ser;dur={stats.serialize_s * 1000:.1f}'
+    )
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that adds its render time to the current request's serialize_s."""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        body = super().render(content)
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_s += time.perf_counter() - start
+        return body
+
+
+class MetricsMiddleware:
+    """Times HTTP requests, records per-route metrics and adds a Server-Timing header.
+
+    Plain ASGI (not BaseHTTPMiddleware) so streaming and SSE responses pass through untouched.
+    Server-Timing covers the work done before the response headers are sent.
+    """
+
+    def __init__(self, app: ASGIApp, *, server_timing: bool = True, slow_request_ms: int = 0) -> None:
+        self.app = app
+        self.server_timing = server_timing
+        self.slow_request_s = slow_request_ms / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(capture_sql=self.slow_request_s > 0)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing(time.perf_counter() - start, stats))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't blow up cardinality
+            path = getattr(route, "path", None) or "<unmatched>"
+            wall_s = time.perf_counter() - start
+            observe_request(scope["method"], path, status, wall_s, stats)
+            if self.slow_request_s and wall_s >= self.slow_request_s:
+                _log_slow_request(scope["method"], scope["path"], path, status, wall_s, stats)
+
+
+def _log_slow_request(
+    method: str, path: str, route: str, status: int, wall_s: float, stats: RequestStats,
+) -> None:
+    lines = [
+        f"  {elapsed * 1000:8.1f} ms  {' '.join(sql.split())[:500]}"
+        for elapsed, sql in stats.statements or ()
+    ]
+    logger.warning(
+        "Slow request: %s %s (%s) -> %d in %.1f ms, db %.1f ms in %d queries\n%s",
+        method, path, route, status, wall_s * 1000, stats.db_s * 1000, stats.queries, "\n".join(lines),
+    )
+
+
+# ── Prometheus text format ───────────────────────────
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> list[str]:
+    lines = [
+        f"{name}_bucket{_labels(**labels, le=le)} {n}" for le, n in histogram.cumulative()
+    ]
+    lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels) if labels else ''} {histogram.count}")
+    return lines
+
+
+def render_prometheus(gauges: dict[str, float], counters: dict[str, float]) -> str:
+    """Per-route metrics plus process-level gauges/counters supplied by the caller."""
+    lines = [
+        "# HELP http_request_duration_seconds Wall time per request.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    items = sorted(routes.items())
+    for (method, route, status), m in items:
+        lines += _histogram_lines(
+            "http_request_duration_seconds", m.latency, method=method, route=route, status=status
+        )
+
+    route_counters = [
+        ("http_request_db_seconds_total", "Time spent in database calls.", "db_s"),
+        ("http_request_db_queries_total", "SQL statements executed.", "queries"),
+        ("http_request_db_rows_total", "Rows returned or affected, where the driver reports them.", "rows"),
+        ("http_request_orm_objects_total", "ORM instances loaded from rows.", "orm_objects"),
+        ("http_request_serialize_seconds_total", "Time spent rendering response bodies.", "serialize_s"),
+    ]
+    for name, help_text, attr in route_counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (method, route, status), m in items:
+            value = getattr(m, attr)
+            lines.append(f"{name}{_labels(method=method, route=route, status=status)} {value:g}")
+
+    lines += [
+        "# HELP ws_broadcast_latency_seconds Time from broadcast() to the last socket send.",
+        "# TYPE ws_broadcast_latency_seconds histogram",
+    ]
+    lines += _histogram_lines("ws_broadcast_latency_seconds", ws_broadcast_latency)
+
+    for kind, values in (("gauge", gauges), ("counter", counters)):
+        for name, value in sorted(values.items()):
+            lines += [f"# TYPE {name} {kind}", f"{name} {value:g}"]
+    return "\n".join(lines) + "\n"
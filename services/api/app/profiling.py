@@ -0,0 +1,221 @@
+"""On-demand sampling profiler and tracemalloc snapshots for the admin routes.
+
+Nothing here runs unless PROFILING_ENABLED is set: the middleware is only
+installed then, and the sampler thread only exists while a capture is armed.
+"""
+import gc
+import sys
+import threading
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+_APP_ROOT = str(Path(__file__).resolve().parents[1])
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        filename = filename[len(_APP_ROOT) + 1:]
+    elif "site-packages/" in filename:
+        filename = filename.split("site-packages/", 1)[1]
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class Capture:
+    """Samples the event-loop thread while matching requests are in flight.
+
+    The loop is shared, so samples include whatever else ran concurrently;
+    profile under representative but not overwhelming load.
+    """
+
+    def __init__(self, method: str, route: str, requests: int, interval_s: float) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method.upper()
+        self.route = route
+        self.path_regex = compile_path(route)[0]
+        self.remaining = requests
+        self.requests = requests
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.in_flight = 0
+        self.done = threading.Event()
+        self._thread_id: int | None = None
+        self._sampler: threading.Thread | None = None
+
+    def request_started(self) -> None:
+        if self._sampler is None:
+            self._thread_id = threading.get_ident()
+            self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+            self._sampler.start()
+        self.in_flight += 1
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        self.remaining -= 1
+        if self.remaining <= 0 and self.in_flight <= 0:
+            self.done.set()
+
+    def _run(self) -> None:
+        while not self.done.wait(self.interval_s):
+            if self.in_flight <= 0:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format (flamegraph.pl, speedscope, inferno)."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def status(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "requests": self.requests,
+            "remaining": max(self.remaining, 0),
+            "samples": self.samples,
+            "done": self.done.is_set(),
+        }
+
+
+# Armed capture (at most one at a time) and finished ones, newest last
+armed: Capture | None = None
+finished: dict[str, Capture] = {}
+MAX_FINISHED = 10
+
+
+def arm(method: str, route: str, requests: int, interval_s: float) -> Capture:
+    global armed
+    if armed is not None:
+        armed.done.set()
+        _retire(armed)
+    armed = Capture(method, route, requests, interval_s)
+    return armed
+
+
+def get_capture(capture_id: str) -> Capture | None:
+    if armed is not None and armed.id == capture_id:
+        return armed
+    return finished.get(capture_id)
+
+
+def _retire(capture: Capture) -> None:
+    global armed
+    if armed is capture:
+        armed = None
+    finished[capture.id] = capture
+    while len(finished) > MAX_FINISHED:
+        del finished[next(iter(finished))]
+
+
+class ProfilingMiddleware:
+    """Hands requests matching the armed capture to its sampler; a no-op otherwise.
+
+    Requests are matched on method and the route template's path pattern, before
+    routing, so routes sharing a path are told apart by method alone.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        capture = armed
+        if capture is None or scope["type"] != "http" or scope["method"] != capture.method:
+            await self.app(scope, receive, send)
+            return
+        if not capture.path_regex.match(scope["path"]) or capture.remaining - capture.in_flight <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        capture.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            capture.request_finished()
+            if capture.done.is_set():
+                _retire(capture)
+
+
+# ── Memory ───────────────────────────────────────────
+_baseline: tracemalloc.Snapshot | None = None
+
+MEMORY_FILTERS = {
+    "ws_manager": "*/app/ws_manager.py",
+    "orm": "*/sqlalchemy/orm/*",
+    "app": f"{_APP_ROOT}/app/*",
+}
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+
+
+def start_snapshot(frames: int = 10) -> dict:
+    """Start tracing if needed and take the baseline snapshot later diffs compare to."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _baseline = _snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    return {"tracing": True, "traced_bytes": current, "peak_bytes": peak}
+
+
+def diff(top: int = 25, only: str | None = None) -> dict:
+    if not tracemalloc.is_tracing() or _baseline is None:
+        return {"tracing": False, "stats": []}
+    snapshot = _snapshot()
+    baseline = _baseline
+    if only is not None:
+        # all_frames: attribute allocations made *on behalf of* the module (json, dicts, ...)
+        keep = (tracemalloc.Filter(True, MEMORY_FILTERS[only], all_frames=True),)
+        snapshot, baseline = snapshot.filter_traces(keep), baseline.filter_traces(keep)
+    stats = snapshot.compare_to(baseline, "lineno")[:top]
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "stats": [
+            {
+                "where": str(stat.traceback),
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in stats
+        ],
+    }
+
+
+def stop_tracing() -> None:
+    global _baseline
+    _baseline = None
+    tracemalloc.stop()
+
+
+def identity_map_sizes() -> dict:
+    """Objects held by live ORM sessions; a growing total points at leaked sessions."""
+    from sqlalchemy.orm import Session
+
+    sessions = [o for o in gc.get_objects() if isinstance(o, Session)]
+    sizes = sorted((len(s.identity_map) for s in sessions), reverse=True)
+    return {"sessions": len(sessions), "objects": sum(sizes), "largest": sizes[:10]}
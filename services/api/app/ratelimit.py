@@ -0,0 +1,156 @@
+"""Token-bucket rate limiting for expensive endpoints.
+
+Limits are configured per route name in Settings.RATE_LIMITS, e.g.
+``{"scrape": "ip:10/min,user:30/min"}``. Each rule is ``<scope>:<n>/<period>``:
+a bucket of n tokens per key that refills at n per period, so n is also the burst.
+Scopes: ``ip`` (client address), ``user`` (bearer token subject; skipped for
+anonymous requests) and ``token`` (the wishlist access_token in the path).
+Behind a reverse proxy the client address is only right if uvicorn trusts the
+proxy's X-Forwarded-For (FORWARDED_ALLOW_IPS, set to the proxy's addresses per
+deployment; see the README); otherwise every request shares the proxy's bucket.
+
+Backends: "memory" keeps buckets per worker; "postgres" shares them between
+workers through the rate_limit_buckets table (one upsert per rule and request).
+"""
+import math
+import re
+import time
+from dataclasses import dataclass
+from functools import cache
+
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+
+from app import database
+from app.auth import decode_token
+from app.cache import TTLCache
+from app.config import settings
+
+_PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600}
+_RULE_RE = re.compile(r"^(ip|user|token):(\d+)/(\w+)$")
+
+
+@dataclass(frozen=True)
+class Rule:
+    scope: str
+    capacity: int
+    rate: float  # tokens per second
+
+
+@cache
+def parse_rules(spec: str) -> tuple[Rule, ...]:
+    rules = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        match = _RULE_RE.match(part)
+        if not match or match.group(3) not in _PERIODS:
+            raise ValueError(f"Invalid rate limit rule: {part!r}")
+        scope, n, period = match.group(1), int(match.group(2)), _PERIODS[match.group(3)]
+        rules.append(Rule(scope, n, n / period))
+    return tuple(rules)
+
+
+class MemoryBackend:
+    """Buckets for this worker only. An entry is dropped once it would be full again."""
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        # key -> (tokens, updated_at monotonic)
+        self._buckets = TTLCache[str, tuple[float, float]](maxsize=maxsize, ttl=3600)
+
+    async def take(self, key: str, rule: Rule, cost: float = 1) -> float:
+        """Consume `cost` tokens; return 0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (rule.capacity, now))
+        tokens = min(rule.capacity, tokens + (now - updated) * rule.rate)
+        if tokens < cost:
+            self._buckets.set(key, (tokens, now), ttl=rule.capacity / rule.rate)
+            return (cost - tokens) / rule.rate
+        self._buckets.set(key, (tokens - cost, now), ttl=rule.capacity / rule.rate)
+        return 0.0
+
+    def reset(self) -> None:
+        self._buckets.clear()
+
+
+class PostgresBackend:
+    """Buckets shared by all workers, refilled and debited in a single upsert."""
+
+    # Bucket level after refilling since the last update, capped at capacity
+    _REFILLED = (
+        "LEAST(CAST(:capacity AS float8),"
+        " b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * CAST(:rate AS float8))"
+    )
+    # The WHERE makes the debit conditional: no row comes back when the bucket is short.
+    _TAKE = text(f"""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+        VALUES (:key, CAST(:capacity AS float8) - CAST(:cost AS float8), now())
+        ON CONFLICT (key) DO UPDATE
+            SET tokens = {_REFILLED} - CAST(:cost AS float8), updated_at = now()
+            WHERE {_REFILLED} >= CAST(:cost AS float8)
+        RETURNING b.tokens
+    """)
+    _PEEK = text(f"SELECT {_REFILLED} FROM rate_limit_buckets AS b WHERE key = :key")
+    _PRUNE = text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - interval '1 day'")
+    PRUNE_EVERY = 10_000
+
+    def __init__(self) -> None:
+        self._calls = 0
+
+    async def take(self, key: str, rule: Rule, cost: float = 1) -> float:
+        params = {"key": key, "capacity": rule.capacity, "rate": rule.rate, "cost": cost}
+        async with database.engine.begin() as conn:
+            row = (await conn.execute(self._TAKE, params)).first()
+            if row is None:
+                tokens = (await conn.execute(self._PEEK, params)).scalar() or 0.0
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                await conn.execute(self._PRUNE)
+        if row is not None:
+            return 0.0
+        return max((cost - float(tokens)) / rule.rate, 0.0)
+
+    def reset(self) -> None:
+        pass
+
+
+backend: MemoryBackend | PostgresBackend = (
+    PostgresBackend() if settings.RATE_LIMIT_BACKEND == "postgres" else MemoryBackend()
+)
+
+
+def _scope_key(scope: str, request: Request) -> str | None:
+    if scope == "ip":
+        return request.client.host if request.client else None
+    if scope == "user":
+        auth = request.headers.get("authorization", "")
+        if not auth.lower().startswith("bearer "):
+            return None
+        user_id = decode_token(auth[7:])
+        return str(user_id) if user_id else None
+    return request.path_params.get("access_token")
+
+
+def rate_limit(name: str):
+    """Dependency enforcing Settings.RATE_LIMITS[name]; raises 429 with Retry-After."""
+
+    async def dependency(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        spec = settings.RATE_LIMITS.get(name)
+        if not spec:
+            return
+        wait = 0.0
+        for rule in parse_rules(spec):
+            key = _scope_key(rule.scope, request)
+            if key is None:
+                continue
+            wait = max(wait, await backend.take(f"{name}:{rule.scope}:{key}", rule))
+            if wait:
+                break
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    return dependency
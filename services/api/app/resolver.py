@@ -0,0 +1,65 @@
+"""access_token -> wishlist resolver for the public routes.
+
+Public URLs carry the wishlist's access_token. Resolving it once per worker
+lets the public routes load rows by primary key instead of joining on the
+token for every call. Callers still load the wishlist row itself and check
+is_public on it, so a cached entry never exposes a list that was made private
+or deleted. Only misses (unknown or private tokens) can be stale, for at most
+PUBLIC_TOKEN_NEGATIVE_TTL_S; they are cached to blunt token-guessing traffic.
+"""
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+from app.models import Wishlist
+
+_MISSING = object()
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedWishlist:
+    id: uuid.UUID
+    owner_user_id: uuid.UUID
+    is_public: bool
+    deadline: datetime | None
+
+
+_by_token = TTLCache[str, ResolvedWishlist | None](
+    maxsize=settings.PUBLIC_TOKEN_CACHE_SIZE, ttl=settings.PUBLIC_TOKEN_CACHE_TTL_S
+)
+
+
+async def resolve_public(db: AsyncSession, access_token: str) -> ResolvedWishlist | None:
+    """The public wishlist behind `access_token`, or None if unknown or private."""
+    cached = _by_token.get(access_token, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    result = await db.execute(
+        select(Wishlist.id, Wishlist.owner_user_id, Wishlist.is_public, Wishlist.deadline)
+        .where(Wishlist.access_token == access_token)
+    )
+    row = result.first()
+    if row is None or not row.is_public:
+        _by_token.set(access_token, None, ttl=settings.PUBLIC_TOKEN_NEGATIVE_TTL_S)
+        return None
+    resolved = ResolvedWishlist(*row)
+    _by_token.set(access_token, resolved)
+    return resolved
+
+
+def invalidate(access_token: str) -> None:
+    """Forget a token after its wishlist was updated or deleted (this worker only)."""
+    _by_token.pop(access_token)
+
+
+def clear() -> None:
+    _by_token.clear()
+
+
+def stats() -> dict:
+    return {"size": len(_by_token), "hits": _by_token.hits, "misses": _by_token.misses}
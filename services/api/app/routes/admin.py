@@ -0,0 +1,67 @@
+import secrets
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app import profiling
+from app.config import settings
+from app.ws_manager import manager
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    # 404 rather than 401/403 so the surface is invisible when switched off
+    if not settings.PROFILING_ENABLED or not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+class ProfileRequest(BaseModel):
+    route: str = Field(description="Route template, e.g. /api/wishlists/public/{access_token}")
+    method: str = "GET"
+    requests: int = Field(default=20, ge=1, le=10_000)
+    interval_ms: float = Field(default=5, ge=1, le=1000)
+
+
+@router.post("/profile", dependencies=[Depends(require_admin)], status_code=201)
+async def start_profile(body: ProfileRequest):
+    """Sample the next `requests` requests to `route`; fetch the result by id."""
+    capture = profiling.arm(body.method, body.route, body.requests, body.interval_ms / 1000)
+    return capture.status()
+
+
+@router.get("/profile/{capture_id}", dependencies=[Depends(require_admin)])
+async def get_profile(capture_id: str, format: Literal["collapsed", "json"] = "collapsed"):
+    capture = profiling.get_capture(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json" or not capture.done.is_set():
+        return capture.status()
+    return PlainTextResponse(capture.collapsed())
+
+
+@router.post("/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot(frames: int = Query(default=10, ge=1, le=100)):
+    """Start tracemalloc (if needed) and record the baseline for /memory/diff."""
+    return profiling.start_snapshot(frames)
+
+
+@router.get("/memory/diff", dependencies=[Depends(require_admin)])
+async def memory_diff(
+    top: int = Query(default=25, ge=1, le=500),
+    only: Literal["ws_manager", "orm", "app"] | None = None,
+):
+    result = profiling.diff(top, only)
+    result["ws_manager"] = manager.stats()
+    result["orm_identity_maps"] = profiling.identity_map_sizes()
+    return result
+
+
+@router.delete("/memory", dependencies=[Depends(require_admin)], status_code=204)
+async def memory_stop():
+    """Stop tracemalloc; tracing slows every allocation while it is on."""
+    profiling.stop_tracing()
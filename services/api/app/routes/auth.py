@@ -1,13 +1,13 @@
-import httpx
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth import create_access_token, hash_password, require_user, verify_password
+from app.auth import create_access_token, hash_password, require_user_read, verify_password
 from app.config import settings
 from app.database import get_db
 from app.models import User
+from app.ratelimit import rate_limit
 from app.schemas import LoginRequest, RegisterRequest, TokenResponse, UserResponse
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -21,7 +21,10 @@ class GoogleAuthRequest(BaseModel):
     redirect_uri: str
 
 
-@router.post("/register", response_model=TokenResponse, status_code=201)
+@router.post(
+    "/register", response_model=TokenResponse, status_code=201,
+    dependencies=[Depends(rate_limit("register"))],
+)
 async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
     existing = await db.execute(select(User).where(User.email == body.email))
     if existing.scalar_one_or_none():
@@ -38,7 +41,7 @@ async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
     return TokenResponse(access_token=create_access_token(user.id))
 
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(rate_limit("login"))])
 async def login(body: LoginRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == body.email))
     user = result.scalar_one_or_none()
@@ -52,6 +55,8 @@ async def google_auth(body: GoogleAuthRequest, db: AsyncSession = Depends(get_db
     if not settings.GOOGLE_CLIENT_ID or not settings.GOOGLE_CLIENT_SECRET:
         raise HTTPException(status_code=501, detail="Google OAuth not configured")
 
+    import httpx  # only needed for the rarely used OAuth flow
+
     # Exchange authorization code for access token
     async with httpx.AsyncClient() as client:
         token_resp = await client.post(GOOGLE_TOKEN_URL, data={
@@ -108,5 +113,5 @@ async def google_auth(body: GoogleAuthRequest, db: AsyncSession = Depends(get_db
 
 
 @router.get("/me", response_model=UserResponse)
-async def me(user: User = Depends(require_user)):
+async def me(user: User = Depends(require_user_read)):
     return user
@@ -0,0 +1,79 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import resolver
+from app.database import get_db
+from app.ws_manager import QueueSubscriber, manager
+
+router = APIRouter(prefix="/api/wishlists", tags=["events"])
+
+SSE_KEEPALIVE_S = 15
+
+
+def _sse(message: str) -> str:
+    frame = json.loads(message)
+    return f"id: {frame['seq']}\nevent: {frame['event']}\ndata: {message}\n\n"
+
+
+async def _event_stream(request: Request, subscriber: QueueSubscriber) -> AsyncIterator[str]:
+    # Tell EventSource how long to wait before reconnecting
+    yield "retry: 3000\n\n"
+    try:
+        # Once the manager has dropped a subscriber that fell behind, end the stream:
+        # EventSource reconnects with Last-Event-ID and resumes (or gets a resync)
+        while not subscriber.dropped:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(message)
+    finally:
+        manager.disconnect_all(subscriber)
+
+
+@router.get("/public/{access_token}/events")
+async def public_wishlist_events(
+    access_token: str,
+    request: Request,
+    since: int | None = None,
+    last_event_id: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Server-Sent Events fallback for clients that can't open a WebSocket.
+
+    Frames are the same JSON as /ws/wishlists/{id}; the `id:` is the event seq, so
+    EventSource's automatic Last-Event-ID header resumes without a refetch.
+    """
+    resolved = await resolver.resolve_public(db, access_token)
+    await db.close()
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Wishlist not found or not public")
+    wishlist_id = resolved.id
+
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            pass
+    ip = request.client.host if request.client else ""
+    reason = manager.admit(wishlist_id, ip)
+    if reason:
+        raise HTTPException(status_code=429, detail=reason)
+
+    subscriber = QueueSubscriber()
+    await manager.accept(subscriber, ip=ip)
+    await manager.subscribe(wishlist_id, subscriber, since=since, ack="hello")
+    return StreamingResponse(
+        _event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
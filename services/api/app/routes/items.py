@@ -1,22 +1,47 @@
+import codecs
+import csv
+import io
+import json
 import logging
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterator, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app import resolver, snapshots
 from app.auth import get_current_user, require_user
 from app.database import get_db
+from app.hotset import hot_set
 from app.models import Contribution, Item, ItemStatus, Reservation, Wishlist, User
-from app.schemas import ContributeRequest, ItemCreate, ItemUpdate, ReserveRequest
+from app.ratelimit import rate_limit
+from app.schemas import (
+    ContributeRequest,
+    ItemBatchRequest,
+    ItemBulkCreate,
+    ItemCreate,
+    ItemUpdate,
+    ReserveRequest,
+)
 from app.ws_manager import manager
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/wishlists", tags=["items"])
 
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ROWS = 5000
+MAX_IMPORT_ERRORS = 100
+# A quoted CSV field may span lines, up to these limits per record
+MAX_CSV_RECORD_LINES = 50
+MAX_CSV_RECORD_CHARS = 64 * 1024
+EXPORT_FIELDS = ("title", "url", "price_cents", "currency", "image_url")
+
 
 def _compute_item_status(item: Item, wishlist: Wishlist | None = None) -> str:
     """Compute effective status based on funding and deadline. Does NOT mutate the item."""
@@ -61,18 +86,44 @@ async def _get_owner_item(
     return item
 
 
+async def _get_owner_wishlist(wishlist_id: uuid.UUID, user: User, db: AsyncSession) -> Wishlist:
+    result = await db.execute(
+        select(Wishlist).where(Wishlist.id == wishlist_id, Wishlist.owner_user_id == user.id)
+    )
+    wl = result.scalar_one_or_none()
+    if not wl:
+        raise HTTPException(status_code=404, detail="Wishlist not found")
+    return wl
+
+
+async def _lock_owner_item_ids(
+    wishlist_id: uuid.UUID, item_ids: list[uuid.UUID], user: User, db: AsyncSession,
+) -> list[uuid.UUID]:
+    """Verify ownership and row-lock every requested item; all-or-nothing."""
+    await _get_owner_wishlist(wishlist_id, user, db)
+    wanted = list(dict.fromkeys(item_ids))
+    result = await db.execute(
+        select(Item.id)
+        .where(Item.wishlist_id == wishlist_id, Item.id.in_(wanted))
+        .with_for_update()
+    )
+    found = set(result.scalars().all())
+    if len(found) != len(wanted):
+        missing = [str(i) for i in wanted if i not in found]
+        raise HTTPException(status_code=404, detail=f"Items not found: {', '.join(missing)}")
+    return wanted
+
+
 async def _get_public_item(
     access_token: str, item_id: uuid.UUID, db: AsyncSession,
-    *, lock: bool = False,
+    *, lock: bool = False, populate_existing: bool = False,
 ) -> Item:
+    resolved = await resolver.resolve_public(db, access_token)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Item not found")
     stmt = (
         select(Item)
-        .join(Wishlist)
-        .where(
-            Item.id == item_id,
-            Wishlist.access_token == access_token,
-            Wishlist.is_public == True,
-        )
+        .where(Item.id == item_id, Item.wishlist_id == resolved.id)
         .options(
             selectinload(Item.reservations),
             selectinload(Item.contributions),
@@ -81,8 +132,14 @@ async def _get_public_item(
     )
     if lock:
         stmt = stmt.with_for_update()
+    if populate_existing:
+        # After a commit: reload collections the session still holds from before it
+        stmt = stmt.execution_options(populate_existing=True)
     result = await db.execute(stmt)
     item = result.scalar_one_or_none()
+    if item is not None and not item.wishlist.is_public:
+        resolver.invalidate(access_token)
+        item = None
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
@@ -144,12 +201,133 @@ def _item_dict(
 
 
 async def _broadcast(wishlist_id: uuid.UUID, event: str, item: Item) -> None:
-    """Helper to broadcast and log WS events."""
+    """Write a committed item through to the hot set, then broadcast and log the WS event."""
+    hot_set.apply(wishlist_id, [item])
     data = _item_dict(item, is_owner=False)
     logger.info("WS broadcast: event=%s wishlist=%s item=%s", event, wishlist_id, item.id)
     await manager.broadcast(wishlist_id, event, str(item.id), data)
 
 
+async def _broadcast_many(wishlist_id: uuid.UUID, event: str, items: list[Item]) -> None:
+    """Broadcast one event carrying many items instead of one frame per item."""
+    if not items:
+        return
+    hot_set.apply(wishlist_id, items)
+    data = {"items": [_item_dict(i, is_owner=False) for i in items]}
+    logger.info("WS broadcast: event=%s wishlist=%s items=%d", event, wishlist_id, len(items))
+    await manager.broadcast(wishlist_id, event, "", data)
+
+
+async def _insert_items(db: AsyncSession, wishlist_id: uuid.UUID, rows: list[ItemCreate]) -> list[uuid.UUID]:
+    """Insert validated rows with a single executemany (multi-row VALUES batches), no ORM units."""
+    if not rows:
+        return []
+    # Explicit, strictly increasing created_at keeps the input order stable in
+    # created_at-ordered listings (now() is identical for the whole transaction).
+    base = datetime.now(timezone.utc)
+    records = [
+        {
+            "id": uuid.uuid4(),
+            "wishlist_id": wishlist_id,
+            "status": ItemStatus.active,
+            "reserved": False,
+            "created_at": base + timedelta(microseconds=n),
+            **row.model_dump(),
+        }
+        for n, row in enumerate(rows)
+    ]
+    await db.execute(insert(Item), records)
+    return [r["id"] for r in records]
+
+
+async def _load_items_by_id(
+    db: AsyncSession, item_ids: list[uuid.UUID], *, populate_existing: bool = False,
+) -> list[Item]:
+    if not item_ids:
+        return []
+    stmt = (
+        select(Item)
+        .where(Item.id.in_(item_ids))
+        .options(
+            selectinload(Item.reservations),
+            selectinload(Item.contributions),
+            selectinload(Item.wishlist),
+        )
+        .order_by(Item.created_at, Item.id)
+    )
+    if populate_existing:
+        stmt = stmt.execution_options(populate_existing=True)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    """Decode the request body incrementally and yield it line by line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+def _split_records(pending: list[tuple[int, str]], *, final: bool) -> Iterator[tuple[int, str | None]]:
+    """Take complete CSV records off the front of `pending`, with their start line numbers.
+
+    A record still open after MAX_CSV_RECORD_LINES lines or MAX_CSV_RECORD_CHARS
+    characters (or at the end of the body) has an unbalanced quote: it is yielded
+    as None and the lines after its first are read again as new records.
+    """
+    while pending:
+        quotes = size = 0
+        for n, (_, line) in enumerate(pending, 1):
+            # Quotes inside quoted fields are doubled, so an odd count means the record continues
+            quotes += line.count('"')
+            size += len(line) + 1
+            if quotes % 2 == 0:
+                yield pending[0][0], "\n".join(text for _, text in pending[:n])
+                del pending[:n]
+                break
+            if n >= MAX_CSV_RECORD_LINES or size > MAX_CSV_RECORD_CHARS:
+                yield pending[0][0], None
+                del pending[0]
+                break
+        else:
+            if not final:
+                return
+            yield pending[0][0], None
+            del pending[0]
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, str | None]]:
+    """Join physical lines into CSV records (a quoted field may span lines); see _split_records."""
+    pending: list[tuple[int, str]] = []
+    async for numbered in _numbered(lines):
+        pending.append(numbered)
+        for record in _split_records(pending, final=False):
+            yield record
+    for record in _split_records(pending, final=True):
+        yield record
+
+
+async def _numbered(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, str]]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        yield line_no, line
+
+
+def _validation_errors(exc: ValidationError) -> list[dict]:
+    return [
+        {"loc": list(e["loc"]), "msg": e["msg"]}
+        for e in exc.errors(include_url=False, include_context=False)
+    ]
+
+
 # ── Owner endpoints ──────────────────────────────────
 
 @router.post("/{wishlist_id}/items", status_code=201)
@@ -159,12 +337,7 @@ async def create_item(
     user: User = Depends(require_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(
-        select(Wishlist).where(Wishlist.id == wishlist_id, Wishlist.owner_user_id == user.id)
-    )
-    wl = result.scalar_one_or_none()
-    if not wl:
-        raise HTTPException(status_code=404, detail="Wishlist not found")
+    await _get_owner_wishlist(wishlist_id, user, db)
 
     item = Item(
         wishlist_id=wishlist_id,
@@ -175,12 +348,88 @@ async def create_item(
         image_url=body.image_url,
     )
     db.add(item)
+    await snapshots.mark_stale(db, wishlist_id)
     await db.commit()
     await db.refresh(item)
     await _broadcast(wishlist_id, "item_created", item)
     return _item_dict(item, is_owner=True)
 
 
+# Batch routes are declared before /items/{item_id}/... so "batch" is not parsed as an item id.
+
+@router.post("/{wishlist_id}/items/batch/archive")
+async def batch_archive_items(
+    wishlist_id: uuid.UUID,
+    body: ItemBatchRequest,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db),
+):
+    item_ids = await _lock_owner_item_ids(wishlist_id, body.item_ids, user, db)
+    await db.execute(
+        update(Item)
+        .where(Item.id.in_(item_ids))
+        .values(status=ItemStatus.archived)
+        .execution_options(synchronize_session=False)
+    )
+    await snapshots.mark_stale(db, wishlist_id)
+    await db.commit()
+    items = await _load_items_by_id(db, item_ids, populate_existing=True)
+    await _broadcast_many(wishlist_id, "items_updated", items)
+    return [_item_dict(i, is_owner=True) for i in items]
+
+
+@router.post("/{wishlist_id}/items/batch/move/{new_wishlist_id}")
+async def batch_move_items(
+    wishlist_id: uuid.UUID,
+    new_wishlist_id: uuid.UUID,
+    body: ItemBatchRequest,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if new_wishlist_id == wishlist_id:
+        raise HTTPException(status_code=400, detail="Items are already in this wishlist")
+    item_ids = await _lock_owner_item_ids(wishlist_id, body.item_ids, user, db)
+    result = await db.execute(
+        select(Wishlist).where(Wishlist.id == new_wishlist_id, Wishlist.owner_user_id == user.id)
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Target wishlist not found")
+
+    await db.execute(
+        update(Item)
+        .where(Item.id.in_(item_ids))
+        .values(wishlist_id=new_wishlist_id, status=ItemStatus.active)
+        .execution_options(synchronize_session=False)
+    )
+    await snapshots.mark_stale(db, wishlist_id, new_wishlist_id)
+    await db.commit()
+    items = await _load_items_by_id(db, item_ids, populate_existing=True)
+    # One frame per side instead of two broadcasts per moved item
+    hot_set.remove(wishlist_id, item_ids)
+    await manager.broadcast(wishlist_id, "items_deleted", "", {"item_ids": [str(i) for i in item_ids]})
+    await _broadcast_many(new_wishlist_id, "items_created", items)
+    return [_item_dict(i, is_owner=True) for i in items]
+
+
+@router.post("/{wishlist_id}/items/batch/delete")
+async def batch_delete_items(
+    wishlist_id: uuid.UUID,
+    body: ItemBatchRequest,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db),
+):
+    item_ids = await _lock_owner_item_ids(wishlist_id, body.item_ids, user, db)
+    # reservations/contributions go with the items via ON DELETE CASCADE
+    await db.execute(
+        delete(Item).where(Item.id.in_(item_ids)).execution_options(synchronize_session=False)
+    )
+    await snapshots.mark_stale(db, wishlist_id)
+    await db.commit()
+    hot_set.remove(wishlist_id, item_ids)
+    await manager.broadcast(wishlist_id, "items_deleted", "", {"item_ids": [str(i) for i in item_ids]})
+    return {"deleted": len(item_ids)}
+
+
 @router.patch("/{wishlist_id}/items/{item_id}")
 async def update_item(
     wishlist_id: uuid.UUID,
@@ -200,6 +449,7 @@ async def update_item(
         item.currency = body.currency
     if body.image_url is not None:
         item.image_url = body.image_url
+    await snapshots.mark_stale(db, wishlist_id)
     await db.commit()
     await db.refresh(item)
     item = await _get_owner_item(wishlist_id, item_id, user, db)
@@ -216,7 +466,9 @@ async def delete_item(
 ):
     item = await _get_owner_item(wishlist_id, item_id, user, db)
     await db.delete(item)
+    await snapshots.mark_stale(db, wishlist_id)
     await db.commit()
+    hot_set.remove(wishlist_id, [item_id])
     return None
 
 
@@ -229,6 +481,7 @@ async def archive_item(
 ):
     item = await _get_owner_item(wishlist_id, item_id, user, db, lock=True)
     item.status = "archived"
+    await snapshots.mark_stale(db, wishlist_id)
     await db.commit()
     await db.refresh(item)
     item = await _get_owner_item(wishlist_id, item_id, user, db)
@@ -247,6 +500,7 @@ async def unarchive_item(
     if item.status != "archived":
         raise HTTPException(status_code=400, detail="Item is not archived")
     item.status = "active"
+    await snapshots.mark_stale(db, wishlist_id)
     await db.commit()
     await db.refresh(item)
     item = await _get_owner_item(wishlist_id, item_id, user, db)
@@ -275,6 +529,7 @@ async def move_item(
 
     item.wishlist_id = new_wishlist_id
     item.status = ItemStatus.active
+    await snapshots.mark_stale(db, wishlist_id, new_wishlist_id)
     await db.commit()
     await db.refresh(item)
     item = await _get_owner_item(new_wishlist_id, item_id, user, db)
@@ -283,9 +538,134 @@ async def move_item(
     return _item_dict(item, is_owner=True)
 
 
+# ── Bulk import / export ─────────────────────────────
+
+@router.post("/{wishlist_id}/items/bulk", status_code=201)
+async def bulk_create_items(
+    wishlist_id: uuid.UUID,
+    body: ItemBulkCreate,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await _get_owner_wishlist(wishlist_id, user, db)
+    item_ids = await _insert_items(db, wishlist_id, body.items)
+    await snapshots.mark_stale(db, wishlist_id)
+    await db.commit()
+    items = await _load_items_by_id(db, item_ids)
+    await _broadcast_many(wishlist_id, "items_created", items)
+    return [_item_dict(i, is_owner=True) for i in items]
+
+
+@router.post("/{wishlist_id}/items/import")
+async def import_items(
+    wishlist_id: uuid.UUID,
+    request: Request,
+    format: Literal["csv", "ndjson"] | None = Query(default=None),
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream a CSV (header row required) or NDJSON body into the wishlist.
+
+    Each row is validated with ItemCreate; valid rows are inserted in batches
+    of IMPORT_BATCH_SIZE within one transaction, invalid rows are reported.
+    """
+    await _get_owner_wishlist(wishlist_id, user, db)
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+
+    item_ids: list[uuid.UUID] = []
+    errors: list[dict] = []
+    batch: list[ItemCreate] = []
+    header: list[str] | None = None
+    rows_seen = 0
+    lines = _iter_lines(request)
+    records = _csv_records(lines) if format == "csv" else _numbered(lines)
+    async for line_no, line in records:
+        if line is None:
+            errors.append({"line": line_no, "errors": [{"loc": [], "msg": "Unterminated quoted field"}]})
+            continue
+        if not line.strip():
+            continue
+        try:
+            if format == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [h.strip() for h in values]
+                    continue
+                raw = {k: v for k, v in zip(header, values) if v != ""}
+            else:
+                raw = json.loads(line)
+        except (json.JSONDecodeError, csv.Error) as e:
+            errors.append({"line": line_no, "errors": [{"loc": [], "msg": str(e)}]})
+            continue
+
+        rows_seen += 1
+        if rows_seen > MAX_IMPORT_ROWS:
+            raise HTTPException(status_code=413, detail=f"Import is limited to {MAX_IMPORT_ROWS} rows")
+        try:
+            batch.append(ItemCreate.model_validate(raw))
+        except ValidationError as e:
+            errors.append({"line": line_no, "errors": _validation_errors(e)})
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            item_ids += await _insert_items(db, wishlist_id, batch)
+            batch = []
+    item_ids += await _insert_items(db, wishlist_id, batch)
+    await snapshots.mark_stale(db, wishlist_id)
+    await db.commit()
+
+    if item_ids:
+        items = await _load_items_by_id(db, item_ids)
+        await _broadcast_many(wishlist_id, "items_created", items)
+    return {"created": len(item_ids), "errors": errors[:MAX_IMPORT_ERRORS], "error_count": len(errors)}
+
+
+@router.get("/{wishlist_id}/items/export")
+async def export_items(
+    wishlist_id: uuid.UUID,
+    format: Literal["csv", "ndjson"] = Query(default="ndjson"),
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream the wishlist's items in the same shape import_items accepts."""
+    await _get_owner_wishlist(wishlist_id, user, db)
+    stmt = (
+        select(*(getattr(Item, f) for f in EXPORT_FIELDS))
+        .where(Item.wishlist_id == wishlist_id)
+        .order_by(Item.created_at, Item.id)
+        .execution_options(yield_per=IMPORT_BATCH_SIZE)
+    )
+
+    async def rows() -> AsyncIterator[str]:
+        result = await db.stream(stmt)
+        if format == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(EXPORT_FIELDS)
+            async for partition in result.partitions():
+                for row in partition:
+                    writer.writerow(["" if v is None else v for v in row])
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            yield buf.getvalue()
+        else:
+            async for partition in result.partitions():
+                yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in partition)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="wishlist-{wishlist_id}.{format}"'},
+    )
+
+
 # ── Public endpoints (by access_token) ───────────────
 
-@router.post("/public/{access_token}/items/{item_id}/reserve")
+@router.post(
+    "/public/{access_token}/items/{item_id}/reserve", dependencies=[Depends(rate_limit("reserve"))]
+)
 async def reserve_item(
     access_token: str,
     item_id: uuid.UUID,
@@ -294,8 +674,7 @@ async def reserve_item(
     db: AsyncSession = Depends(get_db),
 ):
     item = await _get_public_item(access_token, item_id, db, lock=True)
-    wl_result = await db.execute(select(Wishlist).where(Wishlist.access_token == access_token))
-    wl = wl_result.scalar_one()
+    wl = item.wishlist
 
     # Owner cannot reserve own items
     if wl.owner_user_id == user.id:
@@ -319,8 +698,9 @@ async def reserve_item(
     item.reserved = True
     item.reserved_at = datetime.now(timezone.utc)
     db.add(reservation)
+    await snapshots.mark_stale(db, wl.id)
     await db.commit()
-    item = await _get_public_item(access_token, item_id, db)
+    item = await _get_public_item(access_token, item_id, db, populate_existing=True)
     await _broadcast(wl.id, "item_reserved", item)
     return _item_dict(item, is_owner=False, current_user=user, _reserved_by_current_user=True)
 
@@ -352,16 +732,17 @@ async def unreserve_item(
     if not remaining_reservations:
         item.reserved = False
         item.reserved_at = None
+    await snapshots.mark_stale(db, item.wishlist_id)
     await db.commit()
 
-    wl_result = await db.execute(select(Wishlist).where(Wishlist.access_token == access_token))
-    wl = wl_result.scalar_one()
-    item = await _get_public_item(access_token, item_id, db)
-    await _broadcast(wl.id, "item_unreserved", item)
+    item = await _get_public_item(access_token, item_id, db, populate_existing=True)
+    await _broadcast(item.wishlist_id, "item_unreserved", item)
     return _item_dict(item, is_owner=False, current_user=user, _reserved_by_current_user=False)
 
 
-@router.post("/public/{access_token}/items/{item_id}/contribute")
+@router.post(
+    "/public/{access_token}/items/{item_id}/contribute", dependencies=[Depends(rate_limit("contribute"))]
+)
 async def contribute_item(
     access_token: str,
     item_id: uuid.UUID,
@@ -370,8 +751,7 @@ async def contribute_item(
     db: AsyncSession = Depends(get_db),
 ):
     item = await _get_public_item(access_token, item_id, db, lock=True)
-    wl_result = await db.execute(select(Wishlist).where(Wishlist.access_token == access_token))
-    wl = wl_result.scalar_one()
+    wl = item.wishlist
     if user and wl.owner_user_id == user.id:
         raise HTTPException(status_code=403, detail="Owner cannot contribute to own items")
 
@@ -403,7 +783,8 @@ async def contribute_item(
         amount_cents=body.amount_cents,
     )
     db.add(contribution)
+    await snapshots.mark_stale(db, wl.id)
     await db.commit()
-    item = await _get_public_item(access_token, item_id, db)
+    item = await _get_public_item(access_token, item_id, db, populate_existing=True)
     await _broadcast(wl.id, "contribution_added", item)
     return _item_dict(item, is_owner=False, current_user=user)
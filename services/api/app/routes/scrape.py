@@ -1,10 +1,9 @@
 import json
 import re
 
-import httpx
-from bs4 import BeautifulSoup
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
+from app.ratelimit import rate_limit
 from app.schemas import ScrapeRequest, ScrapeResponse
 
 router = APIRouter(prefix="/api", tags=["scrape"])
@@ -32,8 +31,12 @@ def _parse_price(text: str | None) -> tuple[int | None, str | None]:
     return None, None
 
 
-@router.post("/scrape", response_model=ScrapeResponse)
+@router.post("/scrape", response_model=ScrapeResponse, dependencies=[Depends(rate_limit("scrape"))])
 async def scrape_url(body: ScrapeRequest):
+    # Imported lazily: httpx + BeautifulSoup are a large share of cold-start import time
+    import httpx
+    from bs4 import BeautifulSoup
+
     try:
         async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
             resp = await client.get(
@@ -0,0 +1,119 @@
+import re
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import require_user_read
+from app.database import get_read_db
+from app.models import Item, User, Wishlist
+
+router = APIRouter(prefix="/api", tags=["search"])
+
+# Must match the expressions of the GIN indexes in alembic 003_search_indexes,
+# otherwise Postgres will not use them.
+_TS_CONFIG = literal_column("'simple'")
+
+
+def _tsvector(*cols):
+    doc = func.coalesce(cols[0], literal_column("''"))
+    for col in cols[1:]:
+        doc = doc.op("||")(literal_column("' '")).op("||")(func.coalesce(col, literal_column("''")))
+    return func.to_tsvector(_TS_CONFIG, doc)
+
+
+def _prefix_tsquery(q: str) -> str | None:
+    """'red sho' -> 'red:* & sho:*' so typeahead matches partial words."""
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        return None
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def _like_escape(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _match_and_rank(q: str, dialect: str, title_col, other_col):
+    """Return (where clause, rank expression) for a title + secondary text column pair."""
+    escaped = _like_escape(q)
+    pattern = f"%{escaped}%"
+    substring = or_(
+        title_col.ilike(pattern, escape="\\"),
+        other_col.ilike(pattern, escape="\\"),
+    )
+    tsq = _prefix_tsquery(q)
+    if dialect == "postgresql" and tsq is not None:
+        tsv = _tsvector(title_col, other_col)
+        query = func.to_tsquery(_TS_CONFIG, tsq)
+        where = or_(tsv.op("@@")(query), substring)
+        rank = func.ts_rank(tsv, query) + func.similarity(title_col, q)
+        return where, rank
+    # SQLite (tests) / unparsable query: plain substring match, title prefix ranked first
+    rank = case(
+        (title_col.ilike(f"{escaped}%", escape="\\"), 2),
+        (title_col.ilike(pattern, escape="\\"), 1),
+        else_=0,
+    )
+    return substring, rank
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(min_length=1, max_length=200, pattern=r"\S"),  # blank would match everything
+    limit: int = Query(default=20, ge=1, le=50),
+    user: User = Depends(require_user_read),
+    db: AsyncSession = Depends(get_read_db),
+):
+    q = q.strip()
+    dialect = db.get_bind().dialect.name
+
+    item_where, item_rank = _match_and_rank(q, dialect, Item.title, Item.url)
+    item_rows = await db.execute(
+        select(
+            Item.id, Item.wishlist_id, Item.title, Item.url, Item.price_cents,
+            Item.currency, Item.image_url, Wishlist.title, item_rank.label("rank"),
+        )
+        .join(Wishlist, Item.wishlist_id == Wishlist.id)
+        .where(Wishlist.owner_user_id == user.id, item_where)
+        .order_by(literal_column("rank").desc(), Item.created_at.desc())
+        .limit(limit)
+    )
+
+    wl_where, wl_rank = _match_and_rank(q, dialect, Wishlist.title, Wishlist.description)
+    wl_rows = await db.execute(
+        select(
+            Wishlist.id, Wishlist.title, Wishlist.description, Wishlist.access_token,
+            wl_rank.label("rank"),
+        )
+        .where(Wishlist.owner_user_id == user.id, wl_where)
+        .order_by(literal_column("rank").desc(), Wishlist.created_at.desc())
+        .limit(limit)
+    )
+
+    return {
+        "items": [
+            {
+                "id": str(r[0]),
+                "wishlist_id": str(r[1]),
+                "title": r[2],
+                "url": r[3],
+                "price_cents": r[4],
+                "currency": r[5],
+                "image_url": r[6],
+                "wishlist_title": r[7],
+                "rank": float(r[8] or 0),
+            }
+            for r in item_rows.all()
+        ],
+        "wishlists": [
+            {
+                "id": str(r[0]),
+                "title": r[1],
+                "description": r[2],
+                "access_token": r[3],
+                "rank": float(r[4] or 0),
+            }
+            for r in wl_rows.all()
+        ],
+    }
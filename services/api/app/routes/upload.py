@@ -1,23 +1,32 @@
 import os
+from functools import cache
 
-import cloudinary
-import cloudinary.uploader
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 
+from app.ratelimit import rate_limit
+
 router = APIRouter(prefix="/api", tags=["upload"])
 
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/svg+xml"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-)
+
+@cache
+def _uploader():
+    # Imported and configured on first upload to keep cloudinary out of cold starts
+    import cloudinary
+    import cloudinary.uploader
+
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+    )
+    return cloudinary.uploader
 
 
-@router.post("/upload")
+@router.post("/upload", dependencies=[Depends(rate_limit("upload"))])
 async def upload_image(file: UploadFile = File(...)):
     if file.content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(status_code=400, detail="Unsupported image type")
@@ -27,7 +36,7 @@ async def upload_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File too large (max 5 MB)")
 
     try:
-        result = cloudinary.uploader.upload(data, folder="wishlist")
+        result = _uploader().upload(data, folder="wishlist")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image upload failed: {e}")
 
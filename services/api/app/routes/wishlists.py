@@ -1,17 +1,42 @@
+import json
 import secrets
 import uuid
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    String,
+    Text,
+    and_,
+    case,
+    cast,
+    exists,
+    false,
+    func,
+    literal_column,
+    not_,
+    or_,
+    select,
+    true,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import lazyload, selectinload
 
-from app.auth import get_current_user, require_user
-from app.database import get_db
-from app.models import Contribution, Item, ItemStatus, Wishlist, User
+from app import hotset, resolver, snapshots
+from app.auth import get_current_user_read, require_user, require_user_read
+from app.config import settings
+from app.database import get_db, get_read_db
+from app.ratelimit import rate_limit
+from app.models import Contribution, Item, ItemStatus, Reservation, Wishlist, User
 from app.schemas import (
+    ItemFilter,
     ItemResponse,
+    PublicWishlistBatchRequest,
     WishlistCreate,
     WishlistListResponse,
     WishlistResponse,
@@ -20,14 +45,15 @@ from app.schemas import (
 
 router = APIRouter(prefix="/api/wishlists", tags=["wishlists"])
 
+PUBLIC_BATCH_CHUNK = 500  # items per streamed partition of a batch fetch
+
 
 def _compute_status(item: Item, wl: Wishlist | None = None) -> str:
     from datetime import datetime, timezone
     if item.status == ItemStatus.archived:
         return ItemStatus.archived.value
     if item.price_cents and item.price_cents > 0:
-        total = sum(c.amount_cents for c in item.contributions)
-        if total >= item.price_cents:
+        if hotset.funding_total(item) >= item.price_cents:
             return ItemStatus.funded.value
     wishlist = wl or getattr(item, "wishlist", None)
     if wishlist and wishlist.deadline:
@@ -38,7 +64,7 @@ def _compute_status(item: Item, wl: Wishlist | None = None) -> str:
 
 
 def _item_to_response(item: Item, is_owner: bool, wl: Wishlist | None = None, current_user: User | None = None) -> dict:
-    total_contributed = sum(c.amount_cents for c in item.contributions)
+    total_contributed = hotset.funding_total(item)
     reservations = []
     contributions = []
     if not is_owner:
@@ -82,7 +108,11 @@ def _item_to_response(item: Item, is_owner: bool, wl: Wishlist | None = None, cu
     }
 
 
-def _wishlist_to_response(wl: Wishlist, is_owner: bool, current_user: User | None = None) -> dict:
+def _wishlist_to_response(
+    wl: Wishlist, is_owner: bool, current_user: User | None = None, items: list[Item] | None = None,
+) -> dict:
+    if items is None:
+        items = wl.items
     return {
         "id": str(wl.id),
         "owner_user_id": str(wl.owner_user_id),
@@ -92,10 +122,228 @@ def _wishlist_to_response(wl: Wishlist, is_owner: bool, current_user: User | Non
         "is_public": wl.is_public,
         "deadline": wl.deadline.isoformat() if wl.deadline else None,
         "created_at": wl.created_at.isoformat(),
-        "items": [_item_to_response(i, is_owner, wl, current_user) for i in wl.items],
+        "items": [_item_to_response(i, is_owner, wl, current_user) for i in items],
     }
 
 
+def _deadline_passed(wl: Wishlist) -> bool:
+    if not wl.deadline:
+        return False
+    deadline = wl.deadline if wl.deadline.tzinfo else wl.deadline.replace(tzinfo=timezone.utc)
+    return deadline < datetime.now(timezone.utc)
+
+
+def _total_contributed_sq():
+    return (
+        select(func.coalesce(func.sum(Contribution.amount_cents), 0))
+        .where(Contribution.item_id == Item.id)
+        .correlate(Item)
+        .scalar_subquery()
+    )
+
+
+def _status_clause(status_filter: str, deadline_passed: bool | ColumnElement[bool]):
+    """SQL equivalent of _compute_status() for a single wishlist's items.
+
+    deadline_passed is a Python bool when the wishlist is already loaded, or a
+    SQL expression when the wishlist row is part of the same statement.
+    """
+    if isinstance(deadline_passed, bool):
+        deadline_passed = true() if deadline_passed else false()
+    total = _total_contributed_sq()
+    price = func.coalesce(Item.price_cents, 0)
+    funded = and_(price > 0, total >= price)
+    not_archived = Item.status != ItemStatus.archived
+    if status_filter == ItemStatus.archived.value:
+        return Item.status == ItemStatus.archived
+    if status_filter == ItemStatus.funded.value:
+        return and_(not_archived, or_(funded, Item.status == ItemStatus.funded))
+    if status_filter == ItemStatus.expired.value:
+        return and_(deadline_passed, not_archived, not_(funded), Item.status != ItemStatus.funded)
+    return and_(Item.status == ItemStatus.active, not_(funded), not_(deadline_passed))
+
+
+def _filter_items(stmt: Select, filters: ItemFilter, deadline_passed: bool | ColumnElement[bool]) -> Select:
+    """Apply ItemFilter's WHERE, ORDER BY and paging to a select over Item."""
+    if filters.status is not None:
+        stmt = stmt.where(_status_clause(filters.status, deadline_passed))
+    if filters.reserved is not None:
+        stmt = stmt.where(Item.reserved == filters.reserved)
+    if filters.min_price is not None:
+        stmt = stmt.where(Item.price_cents >= filters.min_price)
+    if filters.max_price is not None:
+        stmt = stmt.where(Item.price_cents <= filters.max_price)
+    if filters.currency is not None:
+        stmt = stmt.where(Item.currency == filters.currency.upper())
+
+    stmt = stmt.order_by(*_item_order(filters))
+
+    if filters.offset:
+        stmt = stmt.offset(filters.offset)
+    if filters.limit is not None:
+        stmt = stmt.limit(filters.limit)
+    return stmt
+
+
+def _item_order(filters: ItemFilter) -> list[ColumnElement]:
+    if filters.sort == "price":
+        key = Item.price_cents
+    elif filters.sort == "funding":
+        key = _total_contributed_sq() * 1.0 / func.nullif(Item.price_cents, 0)
+    else:
+        key = Item.created_at
+    key = key.desc() if filters.order == "desc" else key.asc()
+    return [key.nulls_last(), Item.id]
+
+
+async def _load_items(db: AsyncSession, wl: Wishlist, filters: ItemFilter) -> list[Item]:
+    stmt = (
+        select(Item)
+        .where(Item.wishlist_id == wl.id)
+        .options(selectinload(Item.reservations), selectinload(Item.contributions))
+    )
+    result = await db.execute(_filter_items(stmt, filters, _deadline_passed(wl)))
+    return list(result.scalars().all())
+
+
+# ── Postgres fast path: the whole payload from one statement ──
+# Mirrors _wishlist_to_response; the response bytes come straight from the
+# database, with no ORM objects or dict building in between.
+
+_EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+
+def _json_fast_path(db: AsyncSession) -> bool:
+    return settings.DB_JSON_FAST_PATH and db.bind is not None and db.bind.dialect.name == "postgresql"
+
+
+def _json_object(**fields: ColumnElement) -> ColumnElement:
+    # Keys are inlined: asyncpg can't infer types for parameters passed to json_build_object
+    args = []
+    for key, value in fields.items():
+        args += [literal_column(f"'{key}'"), value]
+    return func.json_build_object(*args)
+
+
+def _json_array(element: ColumnElement, *order_by: ColumnElement) -> ColumnElement:
+    return func.coalesce(func.json_agg(aggregate_order_by(element, *order_by)), _EMPTY_JSON_ARRAY)
+
+
+def _isoformat(column: ColumnElement) -> ColumnElement:
+    """Same text as datetime.isoformat() on the UTC datetimes asyncpg returns."""
+    utc = func.timezone("UTC", column)
+    fmt = case(
+        (func.to_char(utc, "US") == "000000", literal_column("'YYYY-MM-DD\"T\"HH24:MI:SS\"+00:00\"'")),
+        else_=literal_column("'YYYY-MM-DD\"T\"HH24:MI:SS.US\"+00:00\"'"),
+    )
+    return func.to_char(utc, fmt)
+
+
+def _item_json(
+    total: ColumnElement[int], deadline_passed: ColumnElement[bool], is_owner: bool, viewer_id: uuid.UUID | None,
+) -> ColumnElement:
+    price = func.coalesce(Item.price_cents, 0)
+    status = case(
+        (Item.status == ItemStatus.archived, literal_column("'archived'")),
+        (and_(price > 0, total >= price), literal_column("'funded'")),
+        (and_(deadline_passed, Item.status != ItemStatus.funded), literal_column("'expired'")),
+        else_=cast(Item.status, String),
+    )
+    reservations = contributions = _EMPTY_JSON_ARRAY
+    if not is_owner:
+        reservations = (
+            select(_json_array(
+                _json_object(
+                    id=cast(Reservation.id, String),
+                    reserver_display_name=Reservation.reserver_display_name,
+                    created_at=_isoformat(Reservation.created_at),
+                ),
+                Reservation.created_at, Reservation.id,
+            ))
+            .where(Reservation.item_id == Item.id)
+            .scalar_subquery()
+        )
+        contributions = (
+            select(_json_array(
+                _json_object(
+                    id=cast(Contribution.id, String),
+                    contributor_display_name=Contribution.contributor_display_name,
+                    amount_cents=Contribution.amount_cents,
+                    created_at=_isoformat(Contribution.created_at),
+                ),
+                Contribution.created_at, Contribution.id,
+            ))
+            .where(Contribution.item_id == Item.id)
+            .scalar_subquery()
+        )
+    reserved_by_viewer = false()
+    if viewer_id is not None:
+        reserved_by_viewer = exists().where(
+            Reservation.item_id == Item.id, Reservation.reserver_user_id == viewer_id
+        )
+    return _json_object(
+        id=cast(Item.id, String),
+        wishlist_id=cast(Item.wishlist_id, String),
+        title=Item.title,
+        url=Item.url,
+        price_cents=Item.price_cents,
+        currency=Item.currency,
+        image_url=Item.image_url,
+        status=status,
+        reserved=Item.reserved,
+        is_reserved=Item.reserved,
+        reserved_by_current_user=reserved_by_viewer,
+        reserved_at=_isoformat(Item.reserved_at),
+        created_at=_isoformat(Item.created_at),
+        total_contributed=total,
+        reservations=reservations,
+        contributions=contributions,
+    )
+
+
+def _wishlist_json_stmt(
+    filters: ItemFilter, *where: ColumnElement[bool], is_owner: bool, viewer_id: uuid.UUID | None = None,
+) -> Select:
+    """One row holding the JSON text of the wishlist matching `where`, or no row."""
+    deadline_passed = and_(Wishlist.deadline.is_not(None), Wishlist.deadline < func.now())
+    # Summed once per item, shared by the status and total_contributed fields
+    totals = (
+        select(func.coalesce(func.sum(Contribution.amount_cents), 0).label("total"))
+        .where(Contribution.item_id == Item.id)
+        .lateral("totals")
+    )
+    rows = _filter_items(
+        select(
+            _item_json(totals.c.total, deadline_passed, is_owner, viewer_id).label("item"),
+            func.row_number().over(order_by=_item_order(filters)).label("n"),
+        )
+        .select_from(Item)
+        .join(totals, true())
+        .where(Item.wishlist_id == Wishlist.id)
+        .correlate(Wishlist),
+        filters,
+        deadline_passed,
+    ).lateral("item_rows")
+    items = select(_json_array(rows.c.item, rows.c.n)).select_from(rows).scalar_subquery()
+    payload = _json_object(
+        id=cast(Wishlist.id, String),
+        owner_user_id=cast(Wishlist.owner_user_id, String),
+        title=Wishlist.title,
+        description=Wishlist.description,
+        access_token=Wishlist.access_token,
+        is_public=Wishlist.is_public,
+        deadline=_isoformat(Wishlist.deadline),
+        created_at=_isoformat(Wishlist.created_at),
+        items=items,
+    )
+    return select(cast(payload, Text)).where(*where)
+
+
+async def _is_public(db: AsyncSession, wishlist_id: uuid.UUID) -> bool:
+    result = await db.execute(select(Wishlist.is_public).where(Wishlist.id == wishlist_id))
+    return bool(result.scalar_one_or_none())
+
+
 def _validate_deadline(deadline: datetime | None) -> None:
     if deadline is None:
         return
@@ -130,8 +378,8 @@ async def create_wishlist(
 
 @router.get("")
 async def list_wishlists(
-    user: User = Depends(require_user),
-    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_user_read),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await db.execute(
         select(Wishlist)
@@ -158,21 +406,28 @@ async def list_wishlists(
 @router.get("/{wishlist_id}")
 async def get_wishlist(
     wishlist_id: uuid.UUID,
-    user: User = Depends(require_user),
-    db: AsyncSession = Depends(get_db),
+    filters: ItemFilter = Query(),
+    user: User = Depends(require_user_read),
+    db: AsyncSession = Depends(get_read_db),
 ):
+    if _json_fast_path(db):
+        stmt = _wishlist_json_stmt(
+            filters, Wishlist.id == wishlist_id, Wishlist.owner_user_id == user.id, is_owner=True
+        )
+        body = (await db.execute(stmt)).scalar_one_or_none()
+        if body is None:
+            raise HTTPException(status_code=404, detail="Wishlist not found")
+        return Response(content=body, media_type="application/json")
     result = await db.execute(
         select(Wishlist)
         .where(Wishlist.id == wishlist_id, Wishlist.owner_user_id == user.id)
-        .options(
-            selectinload(Wishlist.items).selectinload(Item.reservations),
-            selectinload(Wishlist.items).selectinload(Item.contributions),
-        )
+        .options(lazyload(Wishlist.items))
     )
     wl = result.scalar_one_or_none()
     if not wl:
         raise HTTPException(status_code=404, detail="Wishlist not found")
-    return _wishlist_to_response(wl, is_owner=True)
+    items = await _load_items(db, wl, filters)
+    return _wishlist_to_response(wl, is_owner=True, items=items)
 
 
 @router.patch("/{wishlist_id}")
@@ -197,7 +452,10 @@ async def update_wishlist(
     if body.deadline is not None:
         _validate_deadline(body.deadline)
         wl.deadline = body.deadline
+    await snapshots.mark_stale(db, wl.id)
     await db.commit()
+    resolver.invalidate(wl.access_token)
+    hotset.hot_set.evict(wl.id)
     await db.refresh(wl)
     return _wishlist_to_response(wl, is_owner=True)
 
@@ -216,25 +474,118 @@ async def delete_wishlist(
         raise HTTPException(status_code=404, detail="Wishlist not found")
     await db.delete(wl)
     await db.commit()
+    resolver.invalidate(wl.access_token)
+    hotset.hot_set.evict(wl.id)
     return None
 
 
 @router.get("/public/{access_token}")
 async def public_get_wishlist(
     access_token: str,
-    user: User | None = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    filters: ItemFilter = Query(),
+    user: User | None = Depends(get_current_user_read),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
-        select(Wishlist)
-        .where(Wishlist.access_token == access_token, Wishlist.is_public == True)
-        .options(
-            selectinload(Wishlist.items).selectinload(Item.reservations),
-            selectinload(Wishlist.items).selectinload(Item.contributions),
+    resolved = await resolver.resolve_public(db, access_token)
+    if resolved is not None and settings.HOT_WISHLISTS_ENABLED and filters == ItemFilter():
+        hot = await hotset.hot_set.read(resolved.id)
+        # The copy's is_public may predate another worker's update: check the row (one PK lookup)
+        if hot is not None and not await _is_public(db, resolved.id):
+            hotset.hot_set.evict(resolved.id)
+            resolver.invalidate(access_token)
+            raise HTTPException(status_code=404, detail="Wishlist not found or not public")
+        if hot is not None:
+            is_owner = user is not None and hot.owner_user_id == user.id
+            return _wishlist_to_response(
+                hot, is_owner=is_owner, current_user=user, items=list(hot.items.values())
+            )
+    if resolved is not None and settings.PUBLIC_SNAPSHOTS_ENABLED and filters == ItemFilter():
+        snapshot = await snapshots.load(db, resolved.id)
+        if snapshot is not None:
+            return snapshots.respond(snapshot, user, request.headers.get("accept-encoding", ""))
+    if resolved is not None and _json_fast_path(db):
+        stmt = _wishlist_json_stmt(
+            filters, Wishlist.id == resolved.id, Wishlist.is_public == True,
+            is_owner=user is not None and resolved.owner_user_id == user.id,
+            viewer_id=user.id if user is not None else None,
         )
-    )
-    wl = result.scalar_one_or_none()
+        body = (await db.execute(stmt)).scalar_one_or_none()
+        if body is None:
+            resolver.invalidate(access_token)
+            raise HTTPException(status_code=404, detail="Wishlist not found or not public")
+        return Response(content=body, media_type="application/json")
+    wl = None
+    if resolved is not None:
+        result = await db.execute(
+            select(Wishlist)
+            .where(Wishlist.id == resolved.id, Wishlist.is_public == True)
+            .options(lazyload(Wishlist.items))
+        )
+        wl = result.scalar_one_or_none()
+        if wl is None:
+            resolver.invalidate(access_token)
     if not wl:
         raise HTTPException(status_code=404, detail="Wishlist not found or not public")
     is_owner = user is not None and wl.owner_user_id == user.id
-    return _wishlist_to_response(wl, is_owner=is_owner, current_user=user)
+    items = await _load_items(db, wl, filters)
+    return _wishlist_to_response(wl, is_owner=is_owner, current_user=user, items=items)
+
+
+@router.post("/public/batch", dependencies=[Depends(rate_limit("public_batch"))])
+async def public_get_wishlists(
+    body: PublicWishlistBatchRequest,
+    user: User | None = Depends(get_current_user_read),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Several public wishlists at once, streamed as NDJSON with one line per access token.
+
+    Each line is {"access_token", "wishlist"} (the public GET payload) or
+    {"access_token", "error": {"status", "detail"}}, in completion order rather
+    than request order. The lists are fetched with one query, their items with
+    one streamed query, plus one query per child table for each partition.
+    """
+    tokens = list(dict.fromkeys(body.access_tokens))
+    result = await db.execute(
+        select(Wishlist)
+        .where(Wishlist.access_token.in_(tokens), Wishlist.is_public == True)
+        .options(lazyload(Wishlist.items), lazyload(Wishlist.owner))
+    )
+    lists = {wl.id: wl for wl in result.scalars().all()}
+    missing = set(tokens) - {wl.access_token for wl in lists.values()}
+    stmt = (
+        select(Item)
+        .where(Item.wishlist_id.in_(list(lists)))
+        .options(lazyload(Item.wishlist), selectinload(Item.reservations), selectinload(Item.contributions))
+        .order_by(Item.wishlist_id, *_item_order(ItemFilter()))
+        .execution_options(yield_per=PUBLIC_BATCH_CHUNK)
+    )
+
+    def line(wl: Wishlist, items: list[Item]) -> str:
+        is_owner = user is not None and wl.owner_user_id == user.id
+        payload = _wishlist_to_response(wl, is_owner=is_owner, current_user=user, items=items)
+        return json.dumps({"access_token": wl.access_token, "wishlist": payload}) + "\n"
+
+    async def rows() -> AsyncIterator[str]:
+        for token in tokens:
+            if token in missing:
+                error = {"status": 404, "detail": "Wishlist not found or not public"}
+                yield json.dumps({"access_token": token, "error": error}) + "\n"
+        pending = dict(lists)
+        current, items = None, []
+        if pending:
+            # Items arrive grouped by list; a list is sent once the next one starts
+            result = await db.stream(stmt)
+            async for partition in result.scalars().partitions():
+                for item in partition:
+                    if item.wishlist_id != current:
+                        if current is not None:
+                            yield line(pending.pop(current), items)
+                        current, items = item.wishlist_id, []
+                    items.append(item)
+        if current is not None:
+            yield line(pending.pop(current), items)
+        for wl in pending.values():  # lists without items
+            yield line(wl, [])
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
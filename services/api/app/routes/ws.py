@@ -1,20 +1,180 @@
+import asyncio
+import json
+import secrets
 import uuid
+from typing import Awaitable, Callable
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth import decode_token
+from app.cache import TTLCache
+from app.config import settings
+from app.database import get_db
+from app.models import Wishlist
 from app.ws_manager import manager
 
 router = APIRouter()
 
+# wishlist_id -> exists; misses are cached briefly so random UUIDs can't hammer the DB
+_wishlist_exists = TTLCache[uuid.UUID, bool](maxsize=10_000, ttl=settings.WS_WISHLIST_CACHE_TTL_S)
+_NEGATIVE_TTL_S = 5
+
+
+async def _check_wishlist(wishlist_id: uuid.UUID, db: AsyncSession) -> bool:
+    exists = _wishlist_exists.get(wishlist_id)
+    if exists is None:
+        result = await db.execute(select(Wishlist.id).where(Wishlist.id == wishlist_id))
+        exists = result.scalar_one_or_none() is not None
+        _wishlist_exists.set(wishlist_id, exists, ttl=None if exists else _NEGATIVE_TTL_S)
+        # Don't hold a pooled connection for the lifetime of the socket
+        await db.close()
+    return exists
+
+
+async def _receive_with_heartbeat(
+    websocket: WebSocket, on_message: Callable[[str], Awaitable[None]] | None = None,
+) -> None:
+    """Ping when the client is quiet; close it if nothing comes back in time."""
+    awaiting_pong = False
+    while True:
+        timeout = settings.WS_PONG_TIMEOUT_S if awaiting_pong else settings.WS_PING_INTERVAL_S
+        try:
+            message = await asyncio.wait_for(websocket.receive_text(), timeout=timeout)
+        except asyncio.TimeoutError:
+            if awaiting_pong:
+                await websocket.close(code=status.WS_1001_GOING_AWAY, reason="Heartbeat timeout")
+                return
+            await websocket.send_text('{"event": "ping", "item_id": "", "data": {}}')
+            awaiting_pong = True
+            continue
+        awaiting_pong = False
+        if on_message is not None:
+            await on_message(message)
+
+
+async def _can_subscribe(
+    wishlist_id: uuid.UUID, user_id: uuid.UUID | None, access_token: str | None, db: AsyncSession,
+) -> bool:
+    """Owners (JWT) may follow any of their lists; others need the public list's access_token."""
+    result = await db.execute(
+        select(Wishlist.owner_user_id, Wishlist.access_token, Wishlist.is_public)
+        .where(Wishlist.id == wishlist_id)
+    )
+    row = result.one_or_none()
+    await db.close()
+    if row is None:
+        return False
+    owner_user_id, wl_token, is_public = row
+    if user_id is not None and owner_user_id == user_id:
+        return True
+    return bool(access_token) and is_public and secrets.compare_digest(wl_token, access_token)
+
 
 @router.websocket("/ws/wishlists/{wishlist_id}")
-async def wishlist_ws(websocket: WebSocket, wishlist_id: uuid.UUID):
-    await manager.connect(wishlist_id, websocket)
+async def wishlist_ws(
+    websocket: WebSocket,
+    wishlist_id: uuid.UUID,
+    since: int | None = None,
+    delta: bool = False,
+    heartbeat: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    # since: last `seq` the client applied; missed events are replayed (or `resync` sent).
+    # delta: receive JSON-patch `patch` ops instead of full `data` for already-known items.
+    # heartbeat: server sends `ping` frames and expects any text back (e.g. "pong");
+    #   other sockets rely on protocol-level pings (uvicorn --ws-ping-interval).
+    if not await _check_wishlist(wishlist_id, db):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Wishlist not found")
+        return
+    ip = websocket.client.host if websocket.client else ""
+    reason = manager.admit(wishlist_id, ip)
+    if reason:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=reason)
+        return
+
+    await manager.connect(wishlist_id, websocket, since=since, delta=delta, ip=ip)
     try:
-        while True:
-            # Keep connection alive, we only broadcast from server
-            await websocket.receive_text()
+        if heartbeat:
+            await _receive_with_heartbeat(websocket)
+        else:
+            while True:
+                # Keep connection alive, we only broadcast from server
+                await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(wishlist_id, websocket)
+        pass
     except Exception:
+        pass
+    finally:
         manager.disconnect(wishlist_id, websocket)
+
+
+@router.websocket("/ws")
+async def multiplexed_ws(
+    websocket: WebSocket,
+    token: str | None = None,
+    delta: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """One socket, many wishlists.
+
+    Client messages (JSON):
+      {"action": "subscribe", "wishlist_id": ..., "access_token": ..., "since": ...}
+      {"action": "unsubscribe", "wishlist_id": ...}
+    Every server frame carries `wishlist_id`. Heartbeat pings are always on.
+    """
+    user_id = decode_token(token) if token else None
+    ip = websocket.client.host if websocket.client else ""
+    if manager.admit(None, ip):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many connections")
+        return
+    await manager.accept(websocket, ip=ip, delta=delta)
+
+    async def reply_error(detail: str, wishlist_id: str | None = None) -> None:
+        await websocket.send_text(json.dumps(
+            {"event": "error", "wishlist_id": wishlist_id, "item_id": "", "data": {"detail": detail}}
+        ))
+
+    async def on_message(message: str) -> None:
+        try:
+            msg = json.loads(message)
+            action = msg.get("action")
+            wishlist_id = uuid.UUID(str(msg.get("wishlist_id")))
+        except (ValueError, TypeError, AttributeError):
+            if message.strip().lower() != "pong":
+                await reply_error("Malformed message")
+            return
+        if action == "unsubscribe":
+            manager.unsubscribe(wishlist_id, websocket)
+            await websocket.send_text(json.dumps(
+                {"event": "unsubscribed", "wishlist_id": str(wishlist_id), "item_id": "", "data": {}}
+            ))
+            return
+        if action != "subscribe":
+            await reply_error("Unknown action", str(wishlist_id))
+            return
+        if wishlist_id in manager.subscriptions(websocket):
+            return
+        if len(manager.subscriptions(websocket)) >= settings.WS_MAX_SUBSCRIPTIONS_PER_SOCKET:
+            await reply_error("Too many subscriptions", str(wishlist_id))
+            return
+        if manager.admit(wishlist_id, None):
+            await reply_error("Too many connections to this wishlist", str(wishlist_id))
+            return
+        if not await _can_subscribe(wishlist_id, user_id, msg.get("access_token"), db):
+            await reply_error("Wishlist not found", str(wishlist_id))
+            return
+        since = msg.get("since")
+        await manager.subscribe(
+            wishlist_id, websocket, since=since if isinstance(since, int) else None, ack="subscribed",
+        )
+
+    try:
+        await _receive_with_heartbeat(websocket, on_message)
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        pass
+    finally:
+        manager.disconnect_all(websocket)
@@ -0,0 +1,71 @@
+"""Alembic revision checks that don't import alembic (it costs ~0.4 s of cold start)."""
+import re
+from functools import cache
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+VERSIONS_DIR = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+_REVISION_RE = re.compile(r'^revision\s*=\s*["\']([^"\']+)["\']', re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision\s*=\s*(.+)$", re.MULTILINE)
+
+
+@cache
+def head_revision() -> str | None:
+    """The single head of alembic/versions, parsed from the migration files."""
+    revisions: set[str] = set()
+    parents: set[str] = set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        source = path.read_text()
+        match = _REVISION_RE.search(source)
+        if not match:
+            continue
+        revisions.add(match.group(1))
+        down = _DOWN_REVISION_RE.search(source)
+        if down:
+            parents.update(re.findall(r'["\']([^"\']+)["\']', down.group(1)))
+    heads = revisions - parents
+    if len(heads) != 1:
+        return None
+    return heads.pop()
+
+
+async def current_revision(conn: AsyncConnection) -> str | None:
+    """The revision stamped in the database, or None if alembic never ran."""
+    # Checked first: on Postgres a failed SELECT would abort the connection's transaction
+    if not await conn.run_sync(lambda c: inspect(c).has_table("alembic_version")):
+        return None
+    result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+    return result.scalar_one_or_none()
+
+
+async def is_current(conn: AsyncConnection) -> bool:
+    head = head_revision()
+    return head is not None and await current_revision(conn) == head
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+async def verify(conn: AsyncConnection) -> str:
+    """Raise SchemaMismatch unless the database is at the alembic head; return the head."""
+    head = head_revision()
+    if head is None:
+        raise SchemaMismatch(f"could not determine a single alembic head in {VERSIONS_DIR}")
+    current = await current_revision(conn)
+    if current is None and await conn.run_sync(lambda c: inspect(c).has_table("users")):
+        # Tables without alembic_version: built by create_all, never migrated
+        raise SchemaMismatch(
+            f"database has tables but no alembic revision, code expects {head}; adopt it once with "
+            "`alembic stamp 001_oauth_deadline && alembic upgrade head` (created by an older release) "
+            "or `alembic stamp head` (created by DB_SCHEMA_MODE=create_all on this release)"
+        )
+    if current != head:
+        raise SchemaMismatch(
+            f"database is at revision {current or '<none>'}, code expects {head}; "
+            "run `alembic upgrade head` (or set DB_SCHEMA_MODE=create_all for local dev)"
+        )
+    return head
@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from typing import Literal
 
 from pydantic import BaseModel, EmailStr, Field, field_validator
 
@@ -83,11 +84,24 @@ class ItemCreate(BaseModel):
     @field_validator("price_cents", mode="before")
     @classmethod
     def coerce_zero_price(cls, v: int | None) -> int | None:
-        if v is not None and v < 0:
+        # CSV imports pass strings; leave coercion to the int field itself
+        if isinstance(v, (int, float)) and v < 0:
             raise ValueError("price_cents must be >= 0")
         return v
 
 
+class ItemBulkCreate(BaseModel):
+    items: list[ItemCreate] = Field(min_length=1, max_length=1000)
+
+
+class ItemBatchRequest(BaseModel):
+    item_ids: list[uuid.UUID] = Field(min_length=1, max_length=500)
+
+
+class PublicWishlistBatchRequest(BaseModel):
+    access_tokens: list[str] = Field(min_length=1, max_length=100)
+
+
 class ItemUpdate(BaseModel):
     title: str | None = Field(default=None, min_length=1, max_length=500)
     url: str | None = None
@@ -96,6 +110,20 @@ class ItemUpdate(BaseModel):
     image_url: str | None = None
 
 
+class ItemFilter(BaseModel):
+    """Query parameters for filtering/sorting the items of a wishlist (pushed down into SQL)."""
+
+    status: Literal["active", "archived", "funded", "expired"] | None = None
+    reserved: bool | None = None
+    min_price: int | None = Field(default=None, ge=0)
+    max_price: int | None = Field(default=None, ge=0)
+    currency: str | None = Field(default=None, min_length=1, max_length=3)
+    sort: Literal["created_at", "price", "funding"] = "created_at"
+    order: Literal["asc", "desc"] = "asc"
+    limit: int | None = Field(default=None, ge=1, le=500)
+    offset: int = Field(default=0, ge=0)
+
+
 class ContributionOut(BaseModel):
     id: uuid.UUID
     contributor_display_name: str
@@ -160,4 +188,6 @@ class ScrapeResponse(BaseModel):
 class WSEvent(BaseModel):
     event: str
     item_id: str
-    data: dict
+    seq: int | None = None
+    data: dict | None = None
+    patch: list[dict] | None = None  # sent instead of data to ?delta=1 sockets
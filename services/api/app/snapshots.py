@@ -0,0 +1,263 @@
+"""Pre-rendered public wishlist snapshots.
+
+The viewer-independent public payload (_wishlist_to_response with
+is_owner=False) is rendered once and stored as JSON bytes in
+wishlist_snapshots. The public route serves it with a single primary-key
+lookup and only parses it for viewers who need an overlay (the owner, or a
+user who reserved one of the items).
+
+Freshness is versioned in the database, so it holds across workers:
+every write to a wishlist or its items calls mark_stale() in the same
+transaction, which bumps `version`. A snapshot is served only while
+`built_version == version`. Otherwise the route falls back to the ORM path
+and a rebuild is queued; rebuilds run in the background, debounced by
+PUBLIC_SNAPSHOT_DEBOUNCE_MS. Writers bump the version whether or not serving
+is enabled, so turning PUBLIC_SNAPSHOTS_ENABLED on never serves old rows.
+
+Snapshots for lists whose deadline has passed since they were built are
+treated as stale too, since the effective item status changes with time.
+
+Export fresh snapshots as static files (e.g. for a CDN):
+
+    cd services/api
+    python -m app.snapshots export ./public --rebuild
+"""
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.responses import Response
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, lazyload
+
+from app import compression, database
+from app.config import settings
+from app.models import User, Wishlist, WishlistSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Sessions for background rebuilds; tests point this at their own engine
+sessionmaker: async_sessionmaker = database.async_session
+
+_pending: dict[uuid.UUID, bool] = {}  # wishlist id -> create the row if missing
+_task: asyncio.Task | None = None
+
+
+def _render(payload: dict) -> bytes:
+    # Byte-for-byte what JSONResponse would send for the same payload
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# ── Write side ───────────────────────────────────────
+async def mark_stale(db: AsyncSession, *wishlist_ids: uuid.UUID) -> None:
+    """Invalidate the lists' snapshots as part of the caller's (uncommitted) write."""
+    ids = list(dict.fromkeys(wishlist_ids))
+    await db.execute(
+        update(WishlistSnapshot)
+        .where(WishlistSnapshot.wishlist_id.in_(ids))
+        .values(version=WishlistSnapshot.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.info.setdefault("stale_snapshots", set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _rebuild_after_commit(session: Session) -> None:
+    for wishlist_id in session.info.pop("stale_snapshots", ()):
+        schedule(wishlist_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop("stale_snapshots", None)
+
+
+def schedule(wishlist_id: uuid.UUID, *, create: bool = False) -> None:
+    """Queue a background rebuild; `create` also snapshots lists that have none yet."""
+    global _task
+    if not settings.PUBLIC_SNAPSHOTS_ENABLED:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:  # sync scripts; the next public read queues it instead
+        return
+    _pending[wishlist_id] = _pending.get(wishlist_id, False) or create
+    if _task is None or _task.done():
+        _task = loop.create_task(_drain())
+
+
+async def _drain() -> None:
+    await asyncio.sleep(settings.PUBLIC_SNAPSHOT_DEBOUNCE_MS / 1000)
+    while _pending:
+        wishlist_id, create = _pending.popitem()
+        try:
+            await rebuild(wishlist_id, create=create)
+        except Exception:
+            logger.exception("Snapshot rebuild failed for wishlist %s", wishlist_id)
+
+
+async def flush() -> None:
+    """Wait for queued rebuilds (tests, shutdown)."""
+    while _task is not None and not _task.done():
+        await asyncio.shield(_task)
+
+
+async def rebuild(wishlist_id: uuid.UUID, *, create: bool = False) -> bool:
+    """Re-render one list's snapshot; returns False if it has none (and create is off)."""
+    from app.routes.wishlists import _load_items, _wishlist_to_response
+    from app.schemas import ItemFilter
+
+    async with sessionmaker() as db:
+        if create:
+            # Commit the row first so writes racing with the render below bump its version
+            db.add(WishlistSnapshot(wishlist_id=wishlist_id, version=0, built_version=-1))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+        # Read the version before the data: the render then includes every write up to it
+        version = (await db.execute(
+            select(WishlistSnapshot.version).where(WishlistSnapshot.wishlist_id == wishlist_id)
+        )).scalar_one_or_none()
+        if version is None:
+            return False
+        result = await db.execute(
+            select(Wishlist).where(Wishlist.id == wishlist_id).options(lazyload(Wishlist.items))
+        )
+        wl = result.scalar_one_or_none()
+        body = reservers = None
+        if wl is not None and wl.is_public:
+            items = await _load_items(db, wl, ItemFilter())
+            body = _render(_wishlist_to_response(wl, is_owner=False, items=items))
+            reservers = {
+                str(i.id): [str(r.reserver_user_id) for r in i.reservations if r.reserver_user_id]
+                for i in items if i.reservations
+            }
+        # A newer rebuild may already have stored a later version; never go backwards
+        await db.execute(
+            update(WishlistSnapshot)
+            .where(WishlistSnapshot.wishlist_id == wishlist_id, WishlistSnapshot.built_version <= version)
+            .values(
+                built_version=version,
+                body=body,
+                reservers=reservers,
+                deadline=wl.deadline if wl is not None else None,
+                generated_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+    return True
+
+
+# ── Read side ────────────────────────────────────────
+async def load(db: AsyncSession, wishlist_id: uuid.UUID) -> WishlistSnapshot | None:
+    """The list's fresh snapshot, or None (a rebuild is queued) if it is missing or stale."""
+    result = await db.execute(
+        select(WishlistSnapshot).where(WishlistSnapshot.wishlist_id == wishlist_id)
+    )
+    snapshot = result.scalar_one_or_none()
+    if snapshot is None or snapshot.built_version != snapshot.version or not _in_date(snapshot):
+        schedule(wishlist_id, create=True)
+        return None
+    if snapshot.body is None:  # private when rendered
+        return None
+    return snapshot
+
+
+def _in_date(snapshot: WishlistSnapshot) -> bool:
+    if snapshot.deadline is None or snapshot.generated_at is None:
+        return True
+    deadline = _aware(snapshot.deadline)
+    return _aware(snapshot.generated_at) >= deadline or deadline > datetime.now(timezone.utc)
+
+
+def respond(snapshot: WishlistSnapshot, user: User | None, accept_encoding: str = "") -> Response | dict:
+    """The snapshot as this viewer should see it; raw bytes unless an overlay applies.
+
+    Raw bytes are sent pre-compressed when the client accepts it, compressed
+    once per built snapshot rather than on every request.
+    """
+    uid = str(user.id) if user is not None else None
+    mine = {item_id for item_id, ids in (snapshot.reservers or {}).items() if uid in ids}
+    payload = None
+    if uid is not None:
+        payload = json.loads(snapshot.body)
+        if payload["owner_user_id"] != uid and not mine:
+            payload = None
+    if payload is None:
+        return _raw(snapshot, accept_encoding)
+
+    is_owner = payload["owner_user_id"] == uid
+    for item in payload["items"]:
+        item["reserved_by_current_user"] = item["id"] in mine
+        if is_owner:
+            item["reservations"] = []
+            item["contributions"] = []
+    return payload
+
+
+def _raw(snapshot: WishlistSnapshot, accept_encoding: str) -> Response:
+    encoding = None
+    if settings.COMPRESSION_ENABLED and len(snapshot.body) >= settings.COMPRESSION_MIN_SIZE:
+        encoding = compression.negotiate(accept_encoding)
+    if encoding is None:
+        return Response(content=snapshot.body, media_type="application/json")
+    # generated_at too: deadline rebuilds re-render without a version bump
+    key = (snapshot.wishlist_id, snapshot.built_version, snapshot.generated_at)
+    return Response(
+        content=compression.cached(key, snapshot.body, encoding),
+        media_type="application/json",
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
+
+
+# ── Static export ────────────────────────────────────
+async def export(directory: Path, *, rebuild_all: bool = False) -> dict[str, int]:
+    """Write each fresh public snapshot to <directory>/<access_token>.json."""
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = {"written": 0, "stale": 0}
+    async with sessionmaker() as db:
+        if rebuild_all:
+            ids = (await db.execute(select(Wishlist.id).where(Wishlist.is_public == True))).scalars().all()
+            for wishlist_id in ids:
+                await rebuild(wishlist_id, create=True)
+        result = await db.execute(
+            select(Wishlist.access_token, WishlistSnapshot)
+            .join(WishlistSnapshot, WishlistSnapshot.wishlist_id == Wishlist.id)
+            .where(Wishlist.is_public == True)
+            .execution_options(populate_existing=True)
+        )
+        for access_token, snapshot in result:
+            if snapshot.body is None or snapshot.built_version != snapshot.version or not _in_date(snapshot):
+                counts["stale"] += 1
+                continue
+            (directory / f"{access_token}.json").write_bytes(snapshot.body)
+            counts["written"] += 1
+    return counts
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Public wishlist snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="write fresh snapshots as static JSON files")
+    export_cmd.add_argument("directory", type=Path)
+    export_cmd.add_argument("--rebuild", action="store_true", help="rebuild every public list first")
+    args = parser.parse_args()
+
+    counts = await export(args.directory, rebuild_all=args.rebuild)
+    print(f"wrote {counts['written']} snapshots to {args.directory}, skipped {counts['stale']} stale")
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,36 +1,304 @@
+import asyncio
 import json
+import time
 import uuid
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict, deque
 
 from fastapi import WebSocket
 
+from app import metrics
+from app.config import settings
+
+
+def _diff(old: dict, new: dict) -> list[dict]:
+    """Shallow JSON-patch (RFC 6902 ops) turning one item payload into the next."""
+    ops = []
+    for key, value in new.items():
+        if key not in old:
+            ops.append({"op": "add", "path": f"/{key}", "value": value})
+        elif old[key] != value:
+            ops.append({"op": "replace", "path": f"/{key}", "value": value})
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"/{key}"})
+    return ops
+
+
+class _History:
+    """Sequence counter, replay ring buffer and last-sent item states of one wishlist."""
+
+    __slots__ = ("seq", "events", "items", "lock")
+
+    def __init__(self, seq: int, maxlen: int) -> None:
+        self.seq = seq
+        # (seq, event, item_id, data, patch)
+        self.events: deque[tuple[int, str, str, dict, list | None]] = deque(maxlen=maxlen)
+        self.items: dict[str, dict] = {}
+        self.lock = asyncio.Lock()
+
+
+class QueueSubscriber:
+    """WebSocket stand-in for non-WS transports (SSE): frames land in a bounded queue.
+
+    A consumer that falls behind overflows the queue, which makes the send fail and
+    the manager drops it like any other dead socket; `dropped` tells the consumer.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, message: str) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            raise
+
 
 class ConnectionManager:
-    def __init__(self) -> None:
+    def __init__(self, coalesce_ms: int | None = None) -> None:
         self._connections: dict[uuid.UUID, list[WebSocket]] = defaultdict(list)
+        self._delta_sockets: set[WebSocket] = set()
+        self._socket_ip: dict[WebSocket, str] = {}
+        # Reverse index socket -> wishlist ids, so one socket can hold many subscriptions
+        self._subscriptions: dict[WebSocket, set[uuid.UUID]] = {}
+        self._ip_counts: Counter[str] = Counter()
+        self._coalesce_s = (settings.WS_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000
+        # wishlist_id -> {item_id (or unique key for multi-item events): (event, item_id, data)}
+        self._pending: dict[uuid.UUID, dict[str, tuple[str, str, dict]]] = {}
+        self._pending_since: dict[uuid.UUID, float] = {}  # first enqueue, for broadcast latency
+        self._flush_tasks: dict[uuid.UUID, asyncio.Task] = {}
+        self._history: OrderedDict[uuid.UUID, _History] = OrderedDict()
+        # Highest seq handed out by this process. Each new history starts above it (and at
+        # least at the current time in ms), so a `since` from an evicted history or a previous
+        # process is always older than anything replayable and triggers a resync.
+        self._last_seq = 0
+        self._key_seq = 0
+        self.events_received = 0
+        self.events_suppressed = 0
+        self.messages_sent = 0
 
-    async def connect(self, wishlist_id: uuid.UUID, ws: WebSocket) -> None:
+    def admit(self, wishlist_id: uuid.UUID | None, ip: str | None) -> str | None:
+        """Return a rejection reason if the per-IP or per-wishlist cap is reached.
+
+        Pass None to skip a check (a multiplexed socket is counted once per IP, then per list).
+        """
+        if ip is not None and self._ip_counts[ip] >= settings.WS_MAX_CONNECTIONS_PER_IP:
+            return "Too many connections from this address"
+        if (
+            wishlist_id is not None
+            and len(self._connections.get(wishlist_id, ())) >= settings.WS_MAX_CONNECTIONS_PER_WISHLIST
+        ):
+            return "Too many connections to this wishlist"
+        return None
+
+    async def accept(self, ws: WebSocket, *, ip: str = "", delta: bool = False) -> None:
+        """Accept a socket with no subscriptions yet (multiplexed clients subscribe later)."""
         await ws.accept()
-        self._connections[wishlist_id].append(ws)
+        self._subscriptions[ws] = set()
+        self._socket_ip[ws] = ip
+        self._ip_counts[ip] += 1
+        if delta:
+            self._delta_sockets.add(ws)
 
-    def disconnect(self, wishlist_id: uuid.UUID, ws: WebSocket) -> None:
-        self._connections[wishlist_id].remove(ws)
-        if not self._connections[wishlist_id]:
+    async def connect(
+        self, wishlist_id: uuid.UUID, ws: WebSocket, *,
+        since: int | None = None, delta: bool = False, ip: str = "",
+    ) -> None:
+        """Accept a single-wishlist socket. With `since`, replay missed events (or send `resync`)."""
+        await self.accept(ws, ip=ip, delta=delta)
+        ack = "hello" if since is not None or delta else None
+        await self.subscribe(wishlist_id, ws, since=since, ack=ack)
+
+    async def subscribe(
+        self, wishlist_id: uuid.UUID, ws: WebSocket, *, since: int | None = None, ack: str | None = None,
+    ) -> None:
+        history = self._get_history(wishlist_id, create=True)
+        async with history.lock:
+            if wishlist_id in self._subscriptions.setdefault(ws, set()):
+                return
+            self._subscriptions[ws].add(wishlist_id)
+            self._connections[wishlist_id].append(ws)
+            if ack is not None:
+                await ws.send_text(self._frame(wishlist_id, ack, "", history.seq, {}))
+            if since is not None:
+                await self._replay(wishlist_id, history, ws, since)
+
+    def unsubscribe(self, wishlist_id: uuid.UUID, ws: WebSocket) -> None:
+        self._subscriptions.get(ws, set()).discard(wishlist_id)
+        sockets = self._connections.get(wishlist_id)
+        if sockets is None:
+            return
+        if ws in sockets:
+            sockets.remove(ws)
+        if not sockets:
             del self._connections[wishlist_id]
 
+    def subscriptions(self, ws: WebSocket) -> set[uuid.UUID]:
+        return self._subscriptions.get(ws, set())
+
+    def disconnect(self, wishlist_id: uuid.UUID, ws: WebSocket) -> None:
+        """Forget a single-wishlist socket."""
+        self.disconnect_all(ws)
+
+    def disconnect_all(self, ws: WebSocket) -> None:
+        """Forget a socket and all its subscriptions via the reverse index.
+
+        Safe to call more than once, e.g. after a failed send already dropped it.
+        """
+        for wishlist_id in list(self._subscriptions.pop(ws, ())):
+            self.unsubscribe(wishlist_id, ws)
+        self._delta_sockets.discard(ws)
+        ip = self._socket_ip.pop(ws, None)
+        if ip is not None:
+            self._ip_counts[ip] -= 1
+            if self._ip_counts[ip] <= 0:
+                del self._ip_counts[ip]
+
     async def broadcast(self, wishlist_id: uuid.UUID, event: str, item_id: str, data: dict) -> None:
-        message = json.dumps({"event": event, "item_id": item_id, "data": data})
-        dead: list[WebSocket] = []
-        for ws in self._connections.get(wishlist_id, []):
-            try:
-                await ws.send_text(message)
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            try:
-                self._connections[wishlist_id].remove(ws)
-            except ValueError:
-                pass
+        self.events_received += 1
+        # Without viewers or replay history nobody can observe the event.
+        if wishlist_id not in self._connections and wishlist_id not in self._history:
+            return
+        if self._coalesce_s <= 0:
+            start = time.perf_counter()
+            await self._send(wishlist_id, event, item_id, data)
+            metrics.ws_broadcast_latency.observe(time.perf_counter() - start)
+            return
+
+        pending = self._pending.get(wishlist_id)
+        if not item_id and pending and any(not key.startswith("#") for key in pending):
+            # A multi-item event may carry items queued above; send their older states first,
+            # or a later update merged into them would be overtaken by this snapshot.
+            await self.flush(wishlist_id)
+        pending = self._pending.setdefault(wishlist_id, {})
+        self._pending_since.setdefault(wishlist_id, time.perf_counter())
+        if item_id:
+            key = item_id
+            previous = pending.get(key)
+            if previous is not None:
+                # Only the latest state of the item is sent; a creation stays a creation.
+                # Assigning over the key keeps its first-seen position in the flush order.
+                self.events_suppressed += 1
+                if previous[0] == "item_created":
+                    event = "item_created"
+        else:
+            self._key_seq += 1
+            key = f"#{self._key_seq}"
+        pending[key] = (event, item_id, data)
+
+        if wishlist_id not in self._flush_tasks:
+            self._flush_tasks[wishlist_id] = asyncio.create_task(self._flush_later(wishlist_id))
+
+    async def flush(self, wishlist_id: uuid.UUID | None = None) -> None:
+        """Send everything queued (for one wishlist or all) without waiting for the window."""
+        targets = [wishlist_id] if wishlist_id is not None else list(self._pending)
+        for wid in targets:
+            task = self._flush_tasks.pop(wid, None)
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+            since = self._pending_since.pop(wid, None)
+            for event, item_id, data in self._pending.pop(wid, {}).values():
+                await self._send(wid, event, item_id, data)
+            if since is not None:
+                metrics.ws_broadcast_latency.observe(time.perf_counter() - since)
+
+    def stats(self) -> dict:
+        return {
+            "connections": sum(len(c) for c in self._connections.values()),
+            "wishlists": len(self._connections),
+            "max_connections_per_wishlist": max(map(len, self._connections.values()), default=0),
+            "client_ips": len(self._ip_counts),
+            "replay_wishlists": len(self._history),
+            "events_received": self.events_received,
+            "events_suppressed": self.events_suppressed,
+            "messages_sent": self.messages_sent,
+        }
+
+    async def _flush_later(self, wishlist_id: uuid.UUID) -> None:
+        await asyncio.sleep(self._coalesce_s)
+        await self.flush(wishlist_id)
+
+    def _get_history(self, wishlist_id: uuid.UUID, *, create: bool = False) -> _History | None:
+        history = self._history.get(wishlist_id)
+        if history is not None:
+            self._history.move_to_end(wishlist_id)
+            return history
+        if not create:
+            return None
+        self._last_seq = max(int(time.time() * 1000), self._last_seq + 1)
+        history = self._history[wishlist_id] = _History(self._last_seq, settings.WS_REPLAY_BUFFER)
+        if len(self._history) > settings.WS_REPLAY_WISHLISTS:
+            for wid in list(self._history):
+                if wid != wishlist_id and wid not in self._connections:
+                    del self._history[wid]
+                    break
+        return history
+
+    @staticmethod
+    def _frame(
+        wishlist_id: uuid.UUID, event: str, item_id: str, seq: int, data: dict | None,
+        patch: list | None = None,
+    ) -> str:
+        # wishlist_id lets multiplexed clients route frames; single-list clients ignore it
+        frame = {"event": event, "wishlist_id": str(wishlist_id), "item_id": item_id, "seq": seq}
+        if patch is not None:
+            frame["patch"] = patch
+        else:
+            frame["data"] = data
+        return json.dumps(frame)
+
+    async def _replay(self, wishlist_id: uuid.UUID, history: _History, ws: WebSocket, since: int) -> None:
+        if since == history.seq:
+            return
+        oldest = history.events[0][0] if history.events else history.seq + 1
+        if since > history.seq or since < oldest - 1:
+            await ws.send_text(self._frame(wishlist_id, "resync", "", history.seq, {}))
+            return
+        delta = ws in self._delta_sockets
+        for seq, event, item_id, data, patch in history.events:
+            if seq > since:
+                await ws.send_text(self._frame(wishlist_id, event, item_id, seq, data, patch if delta else None))
+                self.messages_sent += 1
+
+    def _record(self, history: _History, event: str, item_id: str, data: dict) -> tuple[int, list | None]:
+        history.seq += 1
+        self._last_seq = max(self._last_seq, history.seq)
+        patch = None
+        if item_id:
+            previous = history.items.get(item_id)
+            if previous is not None:
+                patch = _diff(previous, data)
+            history.items[item_id] = data
+        else:
+            for item in data.get("items", []):
+                history.items[item["id"]] = item
+            for removed in data.get("item_ids", []):
+                history.items.pop(removed, None)
+        history.events.append((history.seq, event, item_id, data, patch))
+        return history.seq, patch
+
+    async def _send(self, wishlist_id: uuid.UUID, event: str, item_id: str, data: dict) -> None:
+        history = self._get_history(wishlist_id, create=wishlist_id in self._connections)
+        if history is None:
+            return
+        async with history.lock:
+            seq, patch = self._record(history, event, item_id, data)
+            full = self._frame(wishlist_id, event, item_id, seq, data)
+            delta = self._frame(wishlist_id, event, item_id, seq, data, patch) if patch is not None else full
+            dead: list[WebSocket] = []
+            for ws in self._connections.get(wishlist_id, []):
+                try:
+                    await ws.send_text(delta if ws in self._delta_sockets else full)
+                    self.messages_sent += 1
+                except Exception:
+                    dead.append(ws)
+            for ws in dead:
+                self.disconnect_all(ws)
 
 
 manager = ConnectionManager()
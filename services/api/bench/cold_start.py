@@ -0,0 +1,102 @@
+"""Measure the cold-start cost of the API entry point.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter and
+reports the slowest modules (cumulative, top-level packages only by default),
+then times the first request through the ASGI app.
+
+    cd services/api
+    python bench/cold_start.py            # top 20 packages
+    python bench/cold_start.py --all -n 40  # every module
+    python bench/cold_start.py --no-request
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+# "import time:       123 |       4567 |   package.module"
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+FIRST_REQUEST = """
+import asyncio, time
+t0 = time.perf_counter()
+from httpx import ASGITransport, AsyncClient
+from app.main import app
+t1 = time.perf_counter()
+
+async def main():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as c:
+        r = await c.get("/api/health")
+        r.raise_for_status()
+
+asyncio.run(main())
+t2 = time.perf_counter()
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f}")
+"""
+
+
+def import_times(module: str) -> list[tuple[str, int, int, int]]:
+    """Return (module, self_us, cumulative_us, depth) for every import of ``module``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cum_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cum_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def first_request_ms() -> tuple[float, float]:
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST], cwd=API_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    import_ms, request_ms = proc.stdout.split()
+    return float(import_ms), float(request_ms)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("-n", "--top", type=int, default=20)
+    parser.add_argument("--all", action="store_true", help="report every module, not just top-level ones")
+    parser.add_argument("--no-request", action="store_true", help="skip the first-request timing")
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    total_us = sum(r[1] for r in rows)
+    if not args.all:
+        # keep the target and its direct imports; cumulative time covers the rest
+        rows = [r for r in rows if r[3] <= 1]
+    rows.sort(key=lambda r: r[2], reverse=True)
+
+    print(f"{'module':<50} {'self ms':>9} {'cumul ms':>9}")
+    for name, self_us, cum_us, _ in rows[: args.top]:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cum_us / 1000:>9.1f}")
+    print(f"\nimport {args.module}: {total_us / 1000:.1f} ms total")
+
+    if not args.no_request:
+        t0 = time.perf_counter()
+        import_ms, request_ms = first_request_ms()
+        wall_ms = (time.perf_counter() - t0) * 1000
+        print(f"first request: import {import_ms:.1f} ms + request {request_ms:.1f} ms "
+              f"(process wall {wall_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
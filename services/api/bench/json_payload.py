@@ -0,0 +1,122 @@
+"""Compare the ORM and Postgres JSON paths for building wishlist payloads.
+
+For the largest wishlists in the database, times both ways of producing the
+public GET body:
+
+    orm   Wishlist query + selectin loads, ORM hydration, _wishlist_to_response, json render
+    sql   one json_build_object/json_agg statement (DB_JSON_FAST_PATH)
+
+and checks that they decode to the same document.
+
+    cd services/api
+    python -m bench.seed --preset small --items-per-wishlist 200 --create-schema
+    python -m bench.json_payload                     # 5 largest lists, 20 rounds each
+    python -m bench.json_payload --lists 1 --rounds 100 --viewer-reserved
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import lazyload
+
+from app.database import normalize_url
+from app.models import Item, Reservation, Wishlist
+from app.routes.wishlists import _load_items, _wishlist_json_stmt, _wishlist_to_response
+from app.schemas import ItemFilter
+
+
+def _render(payload: dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+async def _orm(db: AsyncSession, wishlist_id, viewer) -> bytes:
+    result = await db.execute(
+        select(Wishlist).where(Wishlist.id == wishlist_id).options(lazyload(Wishlist.items))
+    )
+    wl = result.scalar_one()
+    items = await _load_items(db, wl, ItemFilter())
+    return _render(_wishlist_to_response(wl, is_owner=False, current_user=viewer, items=items))
+
+
+async def _sql(db: AsyncSession, wishlist_id, viewer) -> bytes:
+    stmt = _wishlist_json_stmt(
+        ItemFilter(), Wishlist.id == wishlist_id, is_owner=False, viewer_id=viewer.id if viewer else None,
+    )
+    return (await db.execute(stmt)).scalar_one().encode("utf-8")
+
+
+async def _time(sessions: async_sessionmaker, build, wishlist_id, viewer, rounds: int) -> tuple[list[float], bytes]:
+    timings, body = [], b""
+    for _ in range(rounds):
+        # A fresh session per round, like a request: no identity-map reuse
+        async with sessions() as db:
+            start = time.perf_counter()
+            body = await build(db, wishlist_id, viewer)
+            timings.append(time.perf_counter() - start)
+    return timings, body
+
+
+class _Viewer:
+    def __init__(self, user_id) -> None:
+        self.id = user_id
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from settings")
+    parser.add_argument("--lists", type=int, default=5, help="benchmark the N largest wishlists")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--viewer-reserved", action="store_true",
+                        help="render as a user who reserved an item in the list")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        from app.config import settings
+        args.database_url = settings.DATABASE_URL
+    url, connect_args = normalize_url(args.database_url)
+    engine = create_async_engine(url, connect_args=connect_args)
+    if engine.dialect.name != "postgresql":
+        parser.error("the JSON path needs PostgreSQL")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with sessions() as db:
+        result = await db.execute(
+            select(Item.wishlist_id, func.count())
+            .group_by(Item.wishlist_id)
+            .order_by(func.count().desc())
+            .limit(args.lists)
+        )
+        largest = result.all()
+    if not largest:
+        parser.error("no items in the database; run bench.seed first")
+
+    print(f"{'items':>7}  {'orm p50':>9}  {'sql p50':>9}  {'speedup':>7}  {'bytes':>9}  same")
+    for wishlist_id, count in largest:
+        viewer = None
+        if args.viewer_reserved:
+            async with sessions() as db:
+                reserver = (await db.execute(
+                    select(Reservation.reserver_user_id)
+                    .join(Item)
+                    .where(Item.wishlist_id == wishlist_id, Reservation.reserver_user_id.is_not(None))
+                    .limit(1)
+                )).scalar_one_or_none()
+            viewer = _Viewer(reserver) if reserver else None
+        orm_times, orm_body = await _time(sessions, _orm, wishlist_id, viewer, args.rounds)
+        sql_times, sql_body = await _time(sessions, _sql, wishlist_id, viewer, args.rounds)
+        orm_p50 = statistics.median(orm_times) * 1000
+        sql_p50 = statistics.median(sql_times) * 1000
+        same = json.loads(orm_body) == json.loads(sql_body)
+        print(
+            f"{count:>7}  {orm_p50:>7.1f}ms  {sql_p50:>7.1f}ms  {orm_p50 / sql_p50:>6.1f}x"
+            f"  {len(sql_body):>9,}  {'yes' if same else 'NO'}"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
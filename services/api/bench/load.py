@@ -0,0 +1,390 @@
+"""Load scenarios for the core API flows, with machine-readable results.
+
+Runs against a live API (and its Postgres), not the test app:
+
+    docker compose -f infra/docker-compose.yml up -d postgres
+    cd services/api
+    DB_SCHEMA_MODE=create_all RATE_LIMIT_ENABLED=false uvicorn app.main:app --port 8000 --workers 1
+    python bench/load.py                                  # all scenarios
+    python bench/load.py public_view reserve_race -c 50   # a subset
+    python bench/load.py --out results/main.json
+    python bench/load.py --compare results/main.json      # exit 1 on regression
+
+Scenarios:
+    public_view         anonymous GETs of a public wishlist
+    reserve_race        many users reserve the same item at once (exactly one may win)
+    contribution_burst  concurrent contributions to one item (total must not overshoot)
+    owner_edit_ws       owner edits items while WS viewers watch; reports delivery latency
+    scrape              /api/scrape against a local fixture server
+
+Query counts and DB time come from the Server-Timing header (METRICS_ENABLED and
+SERVER_TIMING_ENABLED must be on, which is the default). Rate limiting must be off:
+every simulated user comes from one address, so the per-IP limits on register and
+reserve would cut the run short.
+"""
+import argparse
+import asyncio
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import websockets
+
+_TIMING_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries')
+
+
+@dataclass
+class Result:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    db_ms: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+    elapsed_s: float = 0.0
+    extra: dict = field(default_factory=dict)
+
+    def record(self, resp: httpx.Response, latency: float, ok: bool = True) -> None:
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+        match = _TIMING_RE.search(resp.headers.get("server-timing", ""))
+        if match:
+            self.db_ms.append(float(match.group(1)))
+            self.queries.append(int(match.group(2)))
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies)
+        n = len(lat)
+        out = {
+            "requests": n,
+            "errors": self.errors,
+            "throughput_rps": round(n / self.elapsed_s, 1) if self.elapsed_s else 0.0,
+            "p50_ms": _percentile(lat, 50),
+            "p95_ms": _percentile(lat, 95),
+            "p99_ms": _percentile(lat, 99),
+            "mean_db_ms": round(sum(self.db_ms) / len(self.db_ms), 2) if self.db_ms else None,
+            "mean_queries": round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+        }
+        out.update(self.extra)
+        return out
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[idx] * 1000, 2)
+
+
+# ── Setup ────────────────────────────────────────────
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    base_url: str
+    owner: dict
+    guests: list[dict]
+    wishlist: dict
+    items: list[dict]
+
+
+async def _register(client: httpx.AsyncClient, run_id: str, name: str) -> dict:
+    resp = await client.post("/api/auth/register", json={
+        "email": f"bench-{run_id}-{name}@example.com",
+        "password": "bench-password",
+        "display_name": name,
+    })
+    if resp.status_code == 429:
+        sys.exit("rate limited: start the API with RATE_LIMIT_ENABLED=false (see the module docstring)")
+    resp.raise_for_status()
+    return {"name": name, "headers": {"Authorization": f"Bearer {resp.json()['access_token']}"}}
+
+
+async def setup(client: httpx.AsyncClient, base_url: str, guests: int, items: int) -> Context:
+    run_id = uuid.uuid4().hex[:8]
+    owner = await _register(client, run_id, "owner")
+    guest_users = await asyncio.gather(*(_register(client, run_id, f"guest{i}") for i in range(guests)))
+    resp = await client.post("/api/wishlists", json={"title": f"Bench {run_id}"}, headers=owner["headers"])
+    resp.raise_for_status()
+    wishlist = resp.json()
+    rows = [{"title": f"Item {i}", "price_cents": 1000 + i * 100} for i in range(items)]
+    resp = await client.post(
+        f"/api/wishlists/{wishlist['id']}/items/bulk", json={"items": rows}, headers=owner["headers"]
+    )
+    resp.raise_for_status()
+    return Context(client, base_url, owner, list(guest_users), wishlist, resp.json())
+
+
+async def _new_item(ctx: Context, price_cents: int) -> dict:
+    resp = await ctx.client.post(
+        f"/api/wishlists/{ctx.wishlist['id']}/items",
+        json={"title": f"Race {uuid.uuid4().hex[:6]}", "price_cents": price_cents},
+        headers=ctx.owner["headers"],
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def _timed(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> tuple[httpx.Response, float]:
+    start = time.perf_counter()
+    resp = await client.request(method, url, **kwargs)
+    return resp, time.perf_counter() - start
+
+
+async def _closed_loop(result: Result, concurrency: int, total: int, make_request) -> None:
+    """`concurrency` workers issue `total` requests back to back."""
+    remaining = iter(range(total))
+
+    async def worker() -> None:
+        for i in remaining:
+            resp, latency = await make_request(i)
+            result.record(resp, latency, ok=resp.status_code < 400)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed_s = time.perf_counter() - start
+
+
+# ── Scenarios ────────────────────────────────────────
+async def public_view(ctx: Context, args) -> Result:
+    result = Result("public_view")
+    url = f"/api/wishlists/public/{ctx.wishlist['access_token']}"
+    await _closed_loop(result, args.concurrency, args.requests, lambda i: _timed(ctx.client, "GET", url))
+    return result
+
+
+async def reserve_race(ctx: Context, args) -> Result:
+    result = Result("reserve_race")
+    token = ctx.wishlist["access_token"]
+    double_wins = 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        item = await _new_item(ctx, 5000)
+        url = f"/api/wishlists/public/{token}/items/{item['id']}/reserve"
+        responses = await asyncio.gather(*(
+            _timed(ctx.client, "POST", url, json={"display_name": g["name"]}, headers=g["headers"])
+            for g in ctx.guests
+        ))
+        wins = 0
+        for resp, latency in responses:
+            # Losing the race is a 400 "already reserved", not an error
+            result.record(resp, latency, ok=resp.status_code in (200, 400))
+            wins += resp.status_code == 200
+        double_wins += wins > 1
+    result.elapsed_s = time.perf_counter() - start
+    result.extra = {"rounds": args.rounds, "rounds_with_multiple_winners": double_wins}
+    return result
+
+
+async def contribution_burst(ctx: Context, args) -> Result:
+    result = Result("contribution_burst")
+    token = ctx.wishlist["access_token"]
+    amount = 100
+    # Room for only half of the burst, so the overshoot check has something to reject
+    price = amount * max(1, args.requests // 2)
+    item = await _new_item(ctx, price)
+    url = f"/api/wishlists/public/{token}/items/{item['id']}/contribute"
+
+    def contribute(i: int):
+        guest = ctx.guests[i % len(ctx.guests)]
+        return _timed(
+            ctx.client, "POST", url,
+            json={"display_name": guest["name"], "amount_cents": amount}, headers=guest["headers"],
+        )
+
+    await _closed_loop(result, args.concurrency, args.requests, contribute)
+    # 400 once the item is funded is expected
+    result.errors = 0
+    resp = await ctx.client.get(f"/api/wishlists/public/{token}", headers=ctx.guests[0]["headers"])
+    funded = next(i for i in resp.json()["items"] if i["id"] == item["id"])["total_contributed"]
+    result.extra = {"price_cents": price, "total_contributed": funded, "overshoot": funded > price}
+    return result
+
+
+async def owner_edit_ws(ctx: Context, args) -> Result:
+    result = Result("owner_edit_ws")
+    ws_base = ctx.base_url.replace("http", "ws", 1)
+    url = f"{ws_base}/ws/wishlists/{ctx.wishlist['id']}"
+    sockets = [await websockets.connect(url) for _ in range(args.viewers)]
+    delivery: list[float] = []
+    try:
+        items = ctx.items[: max(1, min(len(ctx.items), 10))]
+        start = time.perf_counter()
+        for i in range(args.edits):
+            item = items[i % len(items)]
+            title = f"Edit {i} {uuid.uuid4().hex[:6]}"
+            resp, latency = await _timed(
+                ctx.client, "PATCH", f"/api/wishlists/{ctx.wishlist['id']}/items/{item['id']}",
+                json={"title": title}, headers=ctx.owner["headers"],
+            )
+            sent = time.perf_counter() - latency
+            result.record(resp, latency, ok=resp.status_code == 200)
+            arrivals = await asyncio.gather(*(_wait_for_title(ws, title) for ws in sockets))
+            delivery.extend(t - sent for t in arrivals if t is not None)
+        result.elapsed_s = time.perf_counter() - start
+    finally:
+        await asyncio.gather(*(ws.close() for ws in sockets))
+    delivery.sort()
+    result.extra = {
+        "viewers": args.viewers,
+        "ws_deliveries": len(delivery),
+        "ws_missed": args.edits * args.viewers - len(delivery),
+        "ws_p50_ms": _percentile(delivery, 50),
+        "ws_p95_ms": _percentile(delivery, 95),
+        "ws_p99_ms": _percentile(delivery, 99),
+    }
+    return result
+
+
+async def _wait_for_title(ws, title: str, timeout: float = 5.0) -> float | None:
+    deadline = time.perf_counter() + timeout
+    while (remaining := deadline - time.perf_counter()) > 0:
+        try:
+            frame = json.loads(await asyncio.wait_for(ws.recv(), remaining))
+        except asyncio.TimeoutError:
+            return None
+        if (frame.get("data") or {}).get("title") == title:
+            return time.perf_counter()
+    return None
+
+
+class _ProductPage(BaseHTTPRequestHandler):
+    body = (
+        b'<html><head><title>Fixture</title>'
+        b'<meta property="og:title" content="Bench Headphones">'
+        b'<meta property="og:image" content="http://127.0.0.1/img.jpg">'
+        b'<meta property="product:price:amount" content="129.99">'
+        b'<meta property="product:price:currency" content="USD">'
+        b'</head><body>' + b"<p>filler</p>" * 2000 + b"</body></html>"
+    )
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+async def scrape(ctx: Context, args) -> Result:
+    result = Result("scrape")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ProductPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    page = f"http://127.0.0.1:{server.server_address[1]}/product"
+    try:
+        await _closed_loop(
+            result, args.concurrency, max(1, args.requests // 10),
+            lambda i: _timed(ctx.client, "POST", "/api/scrape", json={"url": page}),
+        )
+    finally:
+        server.shutdown()
+    return result
+
+
+SCENARIOS = {
+    "public_view": public_view,
+    "reserve_race": reserve_race,
+    "contribution_burst": contribution_burst,
+    "owner_edit_ws": owner_edit_ws,
+    "scrape": scrape,
+}
+
+
+# ── Reporting ────────────────────────────────────────
+def _git_sha() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(scenarios: dict[str, dict]) -> None:
+    cols = ("requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "mean_queries", "mean_db_ms")
+    print(f"{'scenario':<20}" + "".join(f"{c:>15}" for c in cols))
+    for name, summary in scenarios.items():
+        print(f"{name:<20}" + "".join(f"{str(summary.get(c, '')):>15}" for c in cols))
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Return a message per metric that regressed more than `max_regression` (0.2 = 20%)."""
+    failures = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for key in ("p95_ms", "p99_ms", "mean_queries"):
+            if now.get(key) is not None and before.get(key):
+                if now[key] > before[key] * (1 + max_regression):
+                    failures.append(f"{name}.{key}: {before[key]} -> {now[key]}")
+        if before.get("throughput_rps") and now["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{name}.throughput_rps: {before['throughput_rps']} -> {now['throughput_rps']}")
+        for key in ("rounds_with_multiple_winners", "overshoot"):
+            if now.get(key):
+                failures.append(f"{name}.{key}: {now[key]}")
+    return failures
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=", ".join(SCENARIOS))
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("-n", "--requests", type=int, default=500, help="requests per closed-loop scenario")
+    parser.add_argument("--guests", type=int, default=20, help="registered guest users (reserve race width)")
+    parser.add_argument("--items", type=int, default=50, help="items on the benchmark wishlist")
+    parser.add_argument("--rounds", type=int, default=20, help="reserve_race rounds")
+    parser.add_argument("--viewers", type=int, default=50, help="owner_edit_ws WebSocket viewers")
+    parser.add_argument("--edits", type=int, default=50, help="owner_edit_ws edits")
+    parser.add_argument("--out", type=Path, help="write results JSON here")
+    parser.add_argument("--compare", type=Path, help="baseline results JSON; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.guests) + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30, limits=limits) as client:
+        ctx = await setup(client, args.base_url, args.guests, args.items)
+        summaries = {}
+        for name in names:
+            result = await SCENARIOS[name](ctx, args)
+            summaries[name] = result.summary()
+
+    results = {
+        "meta": {
+            "git_sha": _git_sha(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "scenarios": summaries,
+    }
+    print_table(summaries)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(results, indent=2, default=str))
+    if args.compare:
+        failures = compare(results, json.loads(args.compare.read_text()), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
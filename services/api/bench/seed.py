@@ -0,0 +1,273 @@
+"""Synthetic dataset generator for performance work.
+
+Bulk-loads users, wishlists, items, reservations and contributions with a
+heavy-tailed distribution: most users have a few small lists, a few have
+hundreds of lists with thousands of items, and popular items collect
+hundreds of contributions. Output is deterministic for a given --seed.
+
+Postgres is loaded with COPY (asyncpg copy_records_to_table); other
+dialects fall back to executemany inserts.
+
+    cd services/api
+    python -m bench.seed --preset medium              # ~1M rows
+    python -m bench.seed --users 200000 --truncate --create-schema
+    python -m bench.seed --database-url sqlite+aiosqlite:///seed.db --preset small --create-schema
+
+From code (benchmarks, query-plan tests):
+
+    from bench.seed import Sizes, seed
+    async with engine.begin() as conn:
+        counts = await seed(conn, Sizes(users=100), seed=1)
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Table, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.database import normalize_url
+from app.models import Base, Contribution, Item, ItemStatus, Reservation, User, Wishlist
+
+# A bcrypt hash of "seed-password", so seeded users can log in
+PASSWORD_HASH = "$2b$12$Nz5/0NZXpmwGiF21lUuGTexSMy2vETllAYpkEtKWmMn9tjStx8BH6"
+CURRENCIES = ("USD", "USD", "USD", "EUR", "EUR", "GBP", "RUB", "JPY")
+WORDS = (
+    "red", "wireless", "vintage", "leather", "ceramic", "espresso", "mechanical", "wool",
+    "headphones", "lamp", "backpack", "keyboard", "kettle", "scarf", "watch", "novel",
+    "camera", "sneakers", "blender", "puzzle", "candle", "mug", "tent", "bicycle",
+)
+
+
+@dataclass
+class Sizes:
+    users: int = 1_000
+    wishlists_per_user: float = 3  # mean; pareto-distributed, capped below
+    items_per_wishlist: float = 20
+    contributions_per_item: float = 4  # mean over items that receive contributions
+    reserved_fraction: float = 0.15
+    contributed_fraction: float = 0.2
+    archived_fraction: float = 0.05
+    deadline_fraction: float = 0.3
+    max_wishlists_per_user: int = 500
+    max_items_per_wishlist: int = 5_000
+    max_contributions_per_item: int = 500
+
+
+PRESETS = {
+    "small": Sizes(users=1_000),  # ~100k rows
+    "medium": Sizes(users=10_000),  # ~1M rows
+    "large": Sizes(users=100_000),  # ~10M rows
+}
+
+# FK order; chunks are always flushed parents first
+_TABLES: tuple[Table, ...] = tuple(
+    m.__table__ for m in (User, Wishlist, Item, Reservation, Contribution)
+)
+
+
+def _skewed(rng: random.Random, mean: float, cap: int, alpha: float = 1.5) -> int:
+    """Pareto-distributed count with the given mean (before capping)."""
+    return min(cap, int(mean * (alpha - 1) / alpha * rng.paretovariate(alpha)))
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+class _Writer:
+    def __init__(self, conn: AsyncConnection, chunk_size: int) -> None:
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.buffers: dict[str, list[dict]] = {t.name: [] for t in _TABLES}
+        self.counts: dict[str, int] = {t.name: 0 for t in _TABLES}
+        self.copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg"
+
+    async def add(self, table: str, row: dict) -> None:
+        self.buffers[table].append(row)
+        if len(self.buffers[table]) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        for table in _TABLES:
+            rows = self.buffers[table.name]
+            if not rows:
+                continue
+            if self.copy:
+                await self._copy(table, rows)
+            else:
+                await self.conn.execute(insert(table), rows)
+            self.counts[table.name] += len(rows)
+            self.buffers[table.name] = []
+
+    async def _copy(self, table: Table, rows: list[dict]) -> None:
+        columns = list(rows[0])
+        records = [
+            tuple(v.name if isinstance(v, ItemStatus) else v for v in (row[c] for c in columns))
+            for row in rows
+        ]
+        raw = await self.conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+
+
+async def seed(
+    conn: AsyncConnection, sizes: Sizes, *, seed: int = 0, chunk_size: int = 20_000,
+) -> dict[str, int]:
+    """Generate and insert a dataset inside `conn`'s transaction; return rows per table."""
+    rng = random.Random(seed)
+    writer = _Writer(conn, chunk_size)
+    now = datetime.now(timezone.utc)
+
+    user_ids: list[uuid.UUID] = []
+    names: list[str] = []
+    for n in range(sizes.users):
+        user_id = _uuid(rng)
+        user_ids.append(user_id)
+        names.append(f"User {n}")
+        await writer.add("users", {
+            "id": user_id,
+            "email": f"seed-{seed}-{n}@example.com",
+            "password_hash": PASSWORD_HASH,
+            "display_name": names[-1],
+            "created_at": now - timedelta(days=rng.uniform(30, 730)),
+        })
+
+    for owner_id in user_ids:
+        for _ in range(_skewed(rng, sizes.wishlists_per_user, sizes.max_wishlists_per_user)):
+            await _seed_wishlist(writer, rng, sizes, owner_id, user_ids, names, now)
+
+    await writer.flush()
+    return writer.counts
+
+
+async def _seed_wishlist(
+    writer: _Writer, rng: random.Random, sizes: Sizes, owner_id: uuid.UUID,
+    user_ids: list[uuid.UUID], names: list[str], now: datetime,
+) -> None:
+    wishlist_id = _uuid(rng)
+    created = now - timedelta(days=rng.uniform(1, 365))
+    deadline = None
+    if rng.random() < sizes.deadline_fraction:
+        deadline = created + timedelta(days=rng.uniform(7, 400))  # some already passed
+    await writer.add("wishlists", {
+        "id": wishlist_id,
+        "owner_user_id": owner_id,
+        "title": f"{rng.choice(WORDS).title()} list",
+        "description": "",
+        "access_token": f"{rng.getrandbits(128):032x}",
+        "is_public": rng.random() < 0.9,
+        "deadline": deadline,
+        "created_at": created,
+    })
+
+    currency = rng.choice(CURRENCIES)
+    for n in range(_skewed(rng, sizes.items_per_wishlist, sizes.max_items_per_wishlist)):
+        item_id = _uuid(rng)
+        # ~$50 median, long tail to a few thousand; one in ten items has no price
+        price = None if rng.random() < 0.1 else int(rng.lognormvariate(8.5, 1.2))
+        item_created = created + timedelta(seconds=n)
+        reserved = rng.random() < sizes.reserved_fraction
+        await writer.add("items", {
+            "id": item_id,
+            "wishlist_id": wishlist_id,
+            "title": " ".join(rng.sample(WORDS, 3)),
+            "url": f"https://shop.example.com/p/{item_id.hex[:12]}",
+            "price_cents": price,
+            "currency": currency,
+            "image_url": None,
+            "status": ItemStatus.archived if rng.random() < sizes.archived_fraction else ItemStatus.active,
+            "reserved": reserved,
+            "reserved_at": item_created + timedelta(days=1) if reserved else None,
+            "created_at": item_created,
+        })
+
+        if reserved:
+            who = rng.randrange(len(user_ids))
+            await writer.add("reservations", {
+                "id": _uuid(rng),
+                "item_id": item_id,
+                "reserver_user_id": user_ids[who],
+                "reserver_display_name": names[who],
+                "created_at": item_created + timedelta(days=1),
+            })
+        elif price and rng.random() < sizes.contributed_fraction:
+            await _seed_contributions(writer, rng, sizes, item_id, price, item_created, user_ids, names)
+
+
+async def _seed_contributions(
+    writer: _Writer, rng: random.Random, sizes: Sizes, item_id: uuid.UUID, price: int,
+    created: datetime, user_ids: list[uuid.UUID], names: list[str],
+) -> None:
+    count = max(1, _skewed(rng, sizes.contributions_per_item, sizes.max_contributions_per_item))
+    # About a third of contributed items end up fully funded; totals never exceed the price
+    target = price if rng.random() < 0.33 else int(price * rng.uniform(0.1, 0.95))
+    count = min(count, target)
+    if count == 0:
+        return
+    share, remainder = divmod(target, count)
+    for n in range(count):
+        who = rng.randrange(len(user_ids))
+        guest = rng.random() < 0.3
+        await writer.add("contributions", {
+            "id": _uuid(rng),
+            "item_id": item_id,
+            "contributor_user_id": None if guest else user_ids[who],
+            "contributor_display_name": f"Guest {who}" if guest else names[who],
+            "amount_cents": share + (remainder if n == 0 else 0),
+            "created_at": created + timedelta(hours=n + 1),
+        })
+
+
+async def truncate(conn: AsyncConnection) -> None:
+    if conn.dialect.name == "postgresql":
+        names = ", ".join(t.name for t in _TABLES)
+        await conn.execute(text(f"TRUNCATE {names} CASCADE"))
+    else:
+        for table in reversed(_TABLES):
+            await conn.execute(table.delete())
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL from settings")
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    for f in fields(Sizes):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), dest=f.name)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first")
+    parser.add_argument("--create-schema", action="store_true", help="run create_all first")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        from app.config import settings
+        args.database_url = settings.DATABASE_URL
+    overrides = {f.name: getattr(args, f.name) for f in fields(Sizes) if getattr(args, f.name) is not None}
+    sizes = Sizes(**{**asdict(PRESETS[args.preset]), **overrides})
+
+    url, connect_args = normalize_url(args.database_url)
+    engine = create_async_engine(url, connect_args=connect_args)
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        if args.create_schema:
+            await conn.run_sync(Base.metadata.create_all)
+        if args.truncate:
+            await truncate(conn)
+        counts = await seed(conn, sizes, seed=args.seed, chunk_size=args.chunk_size)
+    await engine.dispose()
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    for table, n in counts.items():
+        print(f"{table:<15} {n:>12,}")
+    print(f"{'total':<15} {total:>12,}  in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    if engine.dialect.name == "postgresql":
+        print("run ANALYZE before looking at query plans")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
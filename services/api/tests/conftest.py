@@ -27,11 +27,23 @@ def event_loop():
 
 @pytest_asyncio.fixture(autouse=True)
 async def setup_db():
+    from app import compression, hotset, ratelimit, resolver, snapshots
+
+    # Every test client shares one address; don't let buckets leak between tests
+    ratelimit.backend.reset()
+    resolver.clear()
+    hotset.hot_set.clear()
+    compression.clear()
+    snapshots.sessionmaker = TestSession
+    hotset.sessionmaker = TestSession
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+    # Each test runs on its own event loop; the pooled connection's locks bind to the loop
+    # they were first contended on (e.g. by a background snapshot rebuild)
+    await engine.dispose()
 
 
 async def _override_get_db():
@@ -41,10 +53,11 @@ async def _override_get_db():
 
 @pytest_asyncio.fixture
 async def client():
-    from app.database import get_db
+    from app.database import get_db, get_read_db
     from app.main import app
 
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_read_db] = _override_get_db
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
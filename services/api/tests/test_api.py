@@ -1,3 +1,4 @@
+import os
 import uuid
 from datetime import datetime, timedelta, timezone
 
@@ -90,6 +91,18 @@ async def test_delete_item_wrong_owner(client, db_session):
     assert resp.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_owner_edits_items_of_private_wishlist(client, db_session):
+    user = await create_test_user(db_session)
+    wl = await create_test_wishlist(db_session, user)
+    item = await create_test_item(db_session, wl)
+    await client.patch(f"/api/wishlists/{wl.id}", json={"is_public": False}, headers=auth_header(user))
+    resp = await client.post(f"/api/wishlists/{wl.id}/items/{item.id}/archive", headers=auth_header(user))
+    assert resp.status_code == 200
+    resp = await client.delete(f"/api/wishlists/{wl.id}/items/{item.id}", headers=auth_header(user))
+    assert resp.status_code == 204
+
+
 # ── Reservation (authorized only) ───────────────────
 
 
@@ -278,3 +291,1092 @@ async def test_move_item_same_wishlist(client, db_session):
         headers=auth_header(user),
     )
     assert resp.status_code == 400
+
+
+# ── Item filtering / sorting ─────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_filter_items_by_price_and_reserved(client, db_session):
+    owner = await create_test_user(db_session, email="own@flt.com")
+    wl = await create_test_wishlist(db_session, owner)
+    cheap = await create_test_item(db_session, wl, title="Cheap", price_cents=2000)
+    await create_test_item(db_session, wl, title="Pricey", price_cents=9000)
+    taken = await create_test_item(db_session, wl, title="Taken", price_cents=1000)
+    taken.reserved = True
+    await db_session.commit()
+
+    resp = await client.get(
+        f"/api/wishlists/public/{wl.access_token}",
+        params={"reserved": "false", "max_price": 5000},
+    )
+    assert resp.status_code == 200
+    items = resp.json()["items"]
+    assert [i["id"] for i in items] == [str(cheap.id)]
+
+
+@pytest.mark.asyncio
+async def test_filter_items_by_effective_status(client, db_session):
+    owner = await create_test_user(db_session, email="own@st.com")
+    wl = await create_test_wishlist(db_session, owner)
+    funded = await create_test_item(db_session, wl, title="Funded", price_cents=1000)
+    await create_test_item(db_session, wl, title="Open", price_cents=1000)
+    db_session.add(Contribution(item_id=funded.id, contributor_display_name="D", amount_cents=1000))
+    await db_session.commit()
+
+    resp = await client.get(
+        f"/api/wishlists/{wl.id}", params={"status": "funded"}, headers=auth_header(owner),
+    )
+    items = resp.json()["items"]
+    assert [i["title"] for i in items] == ["Funded"]
+    assert items[0]["status"] == "funded"
+
+    resp = await client.get(
+        f"/api/wishlists/{wl.id}", params={"status": "active"}, headers=auth_header(owner),
+    )
+    assert [i["title"] for i in resp.json()["items"]] == ["Open"]
+
+
+@pytest.mark.asyncio
+async def test_sort_items_by_price_with_limit(client, db_session):
+    owner = await create_test_user(db_session, email="own@srt.com")
+    wl = await create_test_wishlist(db_session, owner)
+    await create_test_item(db_session, wl, title="Mid", price_cents=5000)
+    await create_test_item(db_session, wl, title="Free", price_cents=None)
+    await create_test_item(db_session, wl, title="Top", price_cents=9000)
+    await create_test_item(db_session, wl, title="Low", price_cents=100)
+
+    resp = await client.get(
+        f"/api/wishlists/{wl.id}",
+        params={"sort": "price", "order": "desc", "limit": 3},
+        headers=auth_header(owner),
+    )
+    assert [i["title"] for i in resp.json()["items"]] == ["Top", "Mid", "Low"]
+
+
+def test_json_fast_path_builds_payload_in_one_statement():
+    from sqlalchemy.dialects import postgresql
+
+    from app.models import Wishlist
+    from app.routes.wishlists import _wishlist_json_stmt
+    from app.schemas import ItemFilter
+
+    stmt = _wishlist_json_stmt(
+        ItemFilter(status="expired", sort="funding", limit=10),
+        Wishlist.id == uuid.uuid4(), is_owner=False, viewer_id=uuid.uuid4(),
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    # Item rows are correlated to the outer wishlist row, not cross-joined with the table
+    assert sql.count("FROM wishlists") == 1
+    assert "JOIN LATERAL" in sql and "ORDER BY item_rows.n" in sql
+    assert "LIMIT" in sql
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.environ.get("TEST_POSTGRES_URL"), reason="set TEST_POSTGRES_URL to a scratch database")
+async def test_json_fast_path_matches_orm_payload_on_postgres():
+    import json
+
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import lazyload
+
+    from app.database import normalize_url
+    from app.models import Base, Wishlist
+    from app.routes.wishlists import _load_items, _wishlist_json_stmt, _wishlist_to_response
+    from app.schemas import ItemFilter
+
+    url, connect_args = normalize_url(os.environ["TEST_POSTGRES_URL"])
+    pg = create_async_engine(url, connect_args=connect_args)
+    async with pg.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(pg, expire_on_commit=False)
+    try:
+        async with sessions() as db:
+            owner = await create_test_user(db)
+            guest = await create_test_user(db, email="guest@example.com", display_name="Guest")
+            wl = await create_test_wishlist(db, owner, deadline=datetime.now(timezone.utc) + timedelta(days=3))
+            bike = await create_test_item(db, wl, title="Bike", price_cents=5000)
+            lamp = await create_test_item(db, wl, title="Lamp")
+            await create_test_item(db, wl, title="Mug", price_cents=None)
+            lamp.reserved = True
+            db.add_all([
+                Contribution(item_id=bike.id, contributor_display_name="A", amount_cents=5000),
+                Reservation(item_id=lamp.id, reserver_user_id=guest.id, reserver_display_name="G"),
+            ])
+            await db.commit()
+
+        cases = [
+            (ItemFilter(), False, None),
+            (ItemFilter(), False, guest),
+            (ItemFilter(), True, owner),
+            (ItemFilter(sort="funding", order="desc", limit=2), False, None),
+        ]
+        for filters, is_owner, viewer in cases:
+            async with sessions() as db:
+                row = (await db.execute(
+                    select(Wishlist).where(Wishlist.id == wl.id).options(lazyload(Wishlist.items))
+                )).scalar_one()
+                items = await _load_items(db, row, filters)
+                expected = _wishlist_to_response(row, is_owner=is_owner, current_user=viewer, items=items)
+                stmt = _wishlist_json_stmt(
+                    filters, Wishlist.id == wl.id, is_owner=is_owner, viewer_id=viewer.id if viewer else None,
+                )
+                body = (await db.execute(stmt)).scalar_one()
+            assert json.loads(body) == expected
+    finally:
+        async with pg.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await pg.dispose()
+
+
+# ── Metrics ──────────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_server_timing_and_prometheus_metrics(client, db_session, monkeypatch):
+    from app.config import settings
+
+    user = await create_test_user(db_session)
+    wl = await create_test_wishlist(db_session, user)
+    await create_test_item(db_session, wl)
+
+    resp = await client.get(f"/api/wishlists/{wl.id}", headers=auth_header(user))
+    assert resp.status_code == 200
+    timing = resp.headers["server-timing"]
+    assert timing.startswith("app;dur=")
+    queries = int(timing.split('desc="')[1].split(" queries")[0])
+    assert queries >= 2  # user, wishlist, items
+
+    assert (await client.get("/api/metrics")).status_code == 404  # no METRICS_TOKEN configured
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-me")
+    assert (await client.get("/api/metrics")).status_code == 403
+    resp = await client.get("/api/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    route = 'method="GET",route="/api/wishlists/{wishlist_id}",status="200"'
+    assert f"http_request_duration_seconds_count{{{route}}}" in body
+    assert f"http_request_orm_objects_total{{{route}}}" in body
+    assert "ws_broadcast_latency_seconds_count" in body
+    assert "db_pool_checkouts_total" in body
+
+
+# ── Public token resolver ────────────────────────────
+
+
+def _query_count(resp) -> int:
+    return int(resp.headers["server-timing"].split('desc="')[1].split(" queries")[0])
+
+
+@pytest.mark.asyncio
+async def test_public_routes_resolve_token_once_and_invalidate(client, db_session):
+    owner = await create_test_user(db_session)
+    guest = await create_test_user(db_session, email="guest@example.com", display_name="Guest")
+    wl = await create_test_wishlist(db_session, owner)
+    item = await create_test_item(db_session, wl)
+
+    first = await client.get(f"/api/wishlists/public/{wl.access_token}")
+    second = await client.get(f"/api/wishlists/public/{wl.access_token}")
+    assert first.status_code == second.status_code == 200
+    assert _query_count(second) == _query_count(first) - 1
+
+    resp = await client.post(
+        f"/api/wishlists/public/{wl.access_token}/items/{item.id}/reserve",
+        json={"display_name": "G"}, headers=auth_header(guest),
+    )
+    assert resp.status_code == 200
+
+    # Making the list private takes effect immediately despite the cached token
+    resp = await client.patch(f"/api/wishlists/{wl.id}", json={"is_public": False}, headers=auth_header(owner))
+    assert resp.status_code == 200
+    assert (await client.get(f"/api/wishlists/public/{wl.access_token}")).status_code == 404
+    resp = await client.post(
+        f"/api/wishlists/public/{wl.access_token}/items/{item.id}/contribute",
+        json={"display_name": "G", "amount_cents": 100},
+    )
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_unknown_tokens_are_negatively_cached(client):
+    from app import resolver
+
+    for _ in range(3):
+        resp = await client.get("/api/wishlists/public/not-a-real-token")
+        assert resp.status_code == 404
+    assert resolver.stats()["hits"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_hot_wishlist_served_from_memory_with_write_through(client, db_session, monkeypatch):
+    from app import hotset
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "HOT_WISHLISTS_ENABLED", True)
+    monkeypatch.setattr(hotset.hot_set, "promote_rps", 0.1)  # first read promotes
+    owner = await create_test_user(db_session)
+    guest = await create_test_user(db_session, email="guest@example.com", display_name="Guest")
+    wl = await create_test_wishlist(db_session, owner)
+    item = await create_test_item(db_session, wl, title="Lamp")
+    gone = await create_test_item(db_session, wl, title="Kettle")
+    url = f"/api/wishlists/public/{wl.access_token}"
+
+    assert (await client.get(url)).status_code == 200
+    resp = await client.get(url)
+    assert _query_count(resp) == 1  # only the is_public check
+    assert sorted(i["title"] for i in resp.json()["items"]) == ["Kettle", "Lamp"]
+
+    resp = await client.post(
+        f"{url}/items/{item.id}/reserve", json={"display_name": "G"}, headers=auth_header(guest),
+    )
+    assert resp.status_code == 200
+    resp = await client.post(f"{url}/items/{item.id}/contribute", json={"display_name": "H", "amount_cents": 2500})
+    assert resp.status_code == 200
+    resp = await client.delete(f"/api/wishlists/{wl.id}/items/{gone.id}", headers=auth_header(owner))
+    assert resp.status_code == 204
+    resp = await client.get(url)
+    assert _query_count(resp) == 1
+    [hot_item] = resp.json()["items"]
+    assert hot_item["reserved"] and hot_item["reservations"][0]["reserver_display_name"] == "G"
+    assert hot_item["total_contributed"] == 2500
+    resp = await client.get(url, headers=auth_header(guest))
+    assert resp.json()["items"][0]["reserved_by_current_user"]
+    assert hotset.hot_set.stats()["lists"] == 1
+
+    # Filtered reads go to the database
+    resp = await client.get(url, params={"reserved": "false"})
+    assert resp.json()["items"] == []
+    # Made private by another worker: no evict here, the hot copy still says public
+    wl.is_public = False
+    await db_session.commit()
+    assert (await client.get(url)).status_code == 404
+    assert hotset.hot_set.stats()["lists"] == 0
+
+
+@pytest.mark.asyncio
+async def test_public_snapshot_served_while_fresh(client, db_session, monkeypatch):
+    from app import snapshots
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "PUBLIC_SNAPSHOTS_ENABLED", True)
+    monkeypatch.setattr(settings, "PUBLIC_SNAPSHOT_DEBOUNCE_MS", 0)
+    owner = await create_test_user(db_session)
+    guest = await create_test_user(db_session, email="guest@example.com", display_name="Guest")
+    wl = await create_test_wishlist(db_session, owner)
+    item = await create_test_item(db_session, wl)
+    url = f"/api/wishlists/public/{wl.access_token}"
+
+    built = await client.get(url)  # no snapshot yet: rendered from the ORM, rebuild queued
+    await snapshots.flush()
+    resp = await client.get(url)
+    assert _query_count(resp) == 1
+    assert resp.content == built.content
+
+    resp = await client.post(
+        f"{url}/items/{item.id}/reserve", json={"display_name": "G"}, headers=auth_header(guest),
+    )
+    assert resp.status_code == 200
+    # Stale until the rebuild lands, so the write is visible right away
+    assert (await client.get(url)).json()["items"][0]["reserved"]
+    await snapshots.flush()
+
+    resp = await client.get(url)
+    assert _query_count(resp) == 1
+    assert resp.json()["items"][0]["reservations"][0]["reserver_display_name"] == "G"
+    resp = await client.get(url, headers=auth_header(guest))
+    assert resp.json()["items"][0]["reserved_by_current_user"]
+    resp = await client.get(url, headers=auth_header(owner))
+    assert resp.json()["items"][0]["reservations"] == []
+
+
+@pytest.mark.asyncio
+async def test_public_batch_streams_lists_with_set_based_queries(client, db_session):
+    import json
+    from sqlalchemy import event
+    from tests.conftest import engine
+
+    owner = await create_test_user(db_session)
+    guest = await create_test_user(db_session, email="guest@example.com", display_name="Guest")
+    first = await create_test_wishlist(db_session, owner, title="First")
+    second = await create_test_wishlist(db_session, owner, title="Second")
+    empty = await create_test_wishlist(db_session, owner, title="Empty")
+    hidden = await create_test_wishlist(db_session, owner, title="Hidden")
+    hidden.is_public = False
+    await db_session.commit()
+    items = [await create_test_item(db_session, wl, title=f"{wl.title} {n}") for wl in (first, second) for n in range(3)]
+    await client.post(
+        f"/api/wishlists/public/{first.access_token}/items/{items[0].id}/reserve",
+        json={"display_name": "G"}, headers=auth_header(guest),
+    )
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        tokens = [first.access_token, hidden.access_token, "nope", second.access_token, empty.access_token, first.access_token]
+        resp = await client.post(
+            "/api/wishlists/public/batch", json={"access_tokens": tokens}, headers=auth_header(guest),
+        )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+    assert resp.status_code == 200
+    lines = {line["access_token"]: line for line in map(json.loads, resp.text.splitlines())}
+    assert set(lines) == set(tokens)
+    assert lines["nope"]["error"]["status"] == lines[hidden.access_token]["error"]["status"] == 404
+    assert sorted(i["title"] for i in lines[second.access_token]["wishlist"]["items"]) == ["Second 0", "Second 1", "Second 2"]
+    assert lines[empty.access_token]["wishlist"]["items"] == []
+    mine = [i["id"] for i in lines[first.access_token]["wishlist"]["items"] if i["reserved_by_current_user"]]
+    assert mine == [str(items[0].id)]
+    # Viewer (2), then lists, items, reservations and contributions: not one set per list
+    assert len(statements) == 6
+
+    resp = await client.post("/api/wishlists/public/batch", json={"access_tokens": ["t"] * 101})
+    assert resp.status_code == 422
+
+
+# ── Compression ──────────────────────────────────────
+
+
+def test_compression_negotiation():
+    from app.compression import negotiate
+
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, *;q=0.5") is None  # only unavailable codecs left
+    assert negotiate("identity") is None
+    assert negotiate("") is None
+    for n in range(1000):  # client-controlled keys must not grow the cache
+        negotiate(f"gzip;q=0.{n}")
+    assert negotiate.cache_info().currsize <= negotiate.cache_info().maxsize
+
+
+@pytest.mark.asyncio
+async def test_responses_compressed_above_threshold(client, db_session):
+    owner = await create_test_user(db_session)
+    wl = await create_test_wishlist(db_session, owner)
+    for n in range(20):
+        await create_test_item(db_session, wl, title=f"Item number {n}")
+    url = f"/api/wishlists/public/{wl.access_token}"
+
+    resp = await client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert len(resp.json()["items"]) == 20
+    assert "content-encoding" not in (await client.get(url, headers={"Accept-Encoding": "identity"})).headers
+    # Below COMPRESSION_MIN_SIZE
+    resp = await client.get("/api/auth/me", headers={**auth_header(owner), "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+
+    # Streamed bodies are compressed chunk by chunk
+    resp = await client.get(
+        f"/api/wishlists/{wl.id}/items/export", params={"format": "csv"},
+        headers={**auth_header(owner), "Accept-Encoding": "gzip"},
+    )
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Item number 19" in resp.text
+
+
+@pytest.mark.asyncio
+async def test_snapshot_served_precompressed(client, db_session, monkeypatch):
+    from app import compression, snapshots
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "PUBLIC_SNAPSHOTS_ENABLED", True)
+    monkeypatch.setattr(settings, "PUBLIC_SNAPSHOT_DEBOUNCE_MS", 0)
+    calls = []
+    compress = compression.compress
+    monkeypatch.setattr(compression, "compress", lambda *args: calls.append(args[1:]) or compress(*args))
+    owner = await create_test_user(db_session)
+    wl = await create_test_wishlist(db_session, owner)
+    for n in range(20):
+        await create_test_item(db_session, wl, title=f"Item number {n}")
+    url = f"/api/wishlists/public/{wl.access_token}"
+
+    await client.get(url, headers={"Accept-Encoding": "identity"})
+    await snapshots.flush()
+    for _ in range(3):
+        resp = await client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert _query_count(resp) == 1
+    # Compressed once, at the cached level, then reused
+    assert calls == [("gzip", compression.CACHED_LEVELS["gzip"])]
+    assert len(resp.json()["items"]) == 20
+
+
+# ── Search ───────────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_search_scoped_to_owner(client, db_session):
+    owner = await create_test_user(db_session, email="own@srch.com")
+    other = await create_test_user(db_session, email="oth@srch.com")
+    wl = await create_test_wishlist(db_session, owner, title="Camping gear")
+    await create_test_item(db_session, wl, title="Red sneakers")
+    await create_test_item(db_session, wl, title="Tent")
+    other_wl = await create_test_wishlist(db_session, other, title="Sneaker wall")
+    await create_test_item(db_session, other_wl, title="Blue sneakers")
+
+    resp = await client.get("/api/search", params={"q": "sneak"}, headers=auth_header(owner))
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [i["title"] for i in data["items"]] == ["Red sneakers"]
+    assert data["items"][0]["wishlist_title"] == "Camping gear"
+    assert data["wishlists"] == []
+
+    resp = await client.get("/api/search", params={"q": "camp"}, headers=auth_header(owner))
+    assert [w["title"] for w in resp.json()["wishlists"]] == ["Camping gear"]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_prefix_first_and_escapes_wildcards(client, db_session):
+    owner = await create_test_user(db_session, email="own@rk.com")
+    wl = await create_test_wishlist(db_session, owner)
+    await create_test_item(db_session, wl, title="Big lamp")
+    await create_test_item(db_session, wl, title="Lamp shade")
+
+    resp = await client.get("/api/search", params={"q": "lamp"}, headers=auth_header(owner))
+    assert [i["title"] for i in resp.json()["items"]] == ["Lamp shade", "Big lamp"]
+
+    resp = await client.get("/api/search", params={"q": "%"}, headers=auth_header(owner))
+    assert resp.json()["items"] == []
+
+    resp = await client.get("/api/search", params={"q": "   "}, headers=auth_header(owner))
+    assert resp.status_code == 422
+
+
+# ── Bulk import / export ─────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_items(client, db_session):
+    owner = await create_test_user(db_session, email="own@bulk.com")
+    wl = await create_test_wishlist(db_session, owner)
+    resp = await client.post(
+        f"/api/wishlists/{wl.id}/items/bulk",
+        json={"items": [{"title": f"Item {n}", "price_cents": n * 100} for n in range(1, 4)]},
+        headers=auth_header(owner),
+    )
+    assert resp.status_code == 201
+    assert [i["title"] for i in resp.json()] == ["Item 1", "Item 2", "Item 3"]
+
+    # One invalid row rejects the whole JSON batch
+    resp = await client.post(
+        f"/api/wishlists/{wl.id}/items/bulk",
+        json={"items": [{"title": "ok"}, {"title": ""}]},
+        headers=auth_header(owner),
+    )
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson_reports_bad_rows(client, db_session):
+    owner = await create_test_user(db_session, email="own@imp.com")
+    wl = await create_test_wishlist(db_session, owner)
+    body = "\n".join([
+        '{"title": "Lamp", "price_cents": 2500}',
+        '{"title": ""}',
+        "not json",
+        '{"title": "Rug", "currency": "EUR"}',
+    ])
+    resp = await client.post(
+        f"/api/wishlists/{wl.id}/items/import",
+        content=body,
+        headers={**auth_header(owner), "Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["created"] == 2
+    assert [e["line"] for e in data["errors"]] == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_csv_export_import_round_trip(client, db_session):
+    owner = await create_test_user(db_session, email="own@csv.com")
+    src = await create_test_wishlist(db_session, owner, title="Source")
+    dst = await create_test_wishlist(db_session, owner, title="Target")
+    await create_test_item(db_session, src, title="Kettle, steel", price_cents=4200)
+    await create_test_item(db_session, src, title='Mug\n"large"', price_cents=None)
+
+    resp = await client.get(
+        f"/api/wishlists/{src.id}/items/export", params={"format": "csv"}, headers=auth_header(owner),
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+
+    resp = await client.post(
+        f"/api/wishlists/{dst.id}/items/import",
+        content=resp.content,
+        headers={**auth_header(owner), "Content-Type": "text/csv"},
+    )
+    assert resp.json()["created"] == 2
+
+    resp = await client.get(f"/api/wishlists/{dst.id}", headers=auth_header(owner))
+    items = resp.json()["items"]
+    assert sorted((i["title"], i["price_cents"] or 0) for i in items) == [
+        ("Kettle, steel", 4200), ('Mug\n"large"', 0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_import_recovers_from_unbalanced_quote(client, db_session):
+    from app.routes.items import MAX_CSV_RECORD_LINES
+
+    owner = await create_test_user(db_session, email="own@csvq.com")
+    wl = await create_test_wishlist(db_session, owner)
+    rows = [f"Item {n},100" for n in range(MAX_CSV_RECORD_LINES + 10)]
+    body = "\n".join(["title,price_cents", 'Lamp "big,100', *rows, 'Tail "x,5']) + "\n"
+
+    resp = await client.post(
+        f"/api/wishlists/{wl.id}/items/import",
+        content=body.encode(),
+        headers={**auth_header(owner), "Content-Type": "text/csv"},
+    )
+    data = resp.json()
+    # Only the rows with the stray quote are lost, not everything after them
+    assert data["created"] == len(rows)
+    assert [e["line"] for e in data["errors"]] == [2, len(rows) + 3]
+    assert data["errors"][0]["errors"][0]["msg"] == "Unterminated quoted field"
+
+
+# ── Batch operations ─────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_batch_archive_and_delete(client, db_session):
+    owner = await create_test_user(db_session, email="own@batch.com")
+    wl = await create_test_wishlist(db_session, owner)
+    a = await create_test_item(db_session, wl, title="A")
+    b = await create_test_item(db_session, wl, title="B")
+    c = await create_test_item(db_session, wl, title="C")
+
+    resp = await client.post(
+        f"/api/wishlists/{wl.id}/items/batch/archive",
+        json={"item_ids": [str(a.id), str(b.id)]},
+        headers=auth_header(owner),
+    )
+    assert resp.status_code == 200
+    assert {i["status"] for i in resp.json()} == {"archived"}
+
+    resp = await client.post(
+        f"/api/wishlists/{wl.id}/items/batch/delete",
+        json={"item_ids": [str(a.id), str(c.id)]},
+        headers=auth_header(owner),
+    )
+    assert resp.json() == {"deleted": 2}
+
+    resp = await client.get(f"/api/wishlists/{wl.id}", headers=auth_header(owner))
+    assert [i["title"] for i in resp.json()["items"]] == ["B"]
+
+
+@pytest.mark.asyncio
+async def test_batch_move_is_all_or_nothing(client, db_session):
+    owner = await create_test_user(db_session, email="own@bmv.com")
+    other = await create_test_user(db_session, email="oth@bmv.com")
+    wl1 = await create_test_wishlist(db_session, owner, title="WL1")
+    wl2 = await create_test_wishlist(db_session, owner, title="WL2")
+    foreign_wl = await create_test_wishlist(db_session, other)
+    a = await create_test_item(db_session, wl1, title="A")
+    b = await create_test_item(db_session, wl1, title="B")
+    foreign = await create_test_item(db_session, foreign_wl, title="X")
+
+    resp = await client.post(
+        f"/api/wishlists/{wl1.id}/items/batch/move/{wl2.id}",
+        json={"item_ids": [str(a.id), str(foreign.id)]},
+        headers=auth_header(owner),
+    )
+    assert resp.status_code == 404
+
+    resp = await client.post(
+        f"/api/wishlists/{wl1.id}/items/batch/move/{wl2.id}",
+        json={"item_ids": [str(a.id), str(b.id)]},
+        headers=auth_header(owner),
+    )
+    assert resp.status_code == 200
+    assert {i["wishlist_id"] for i in resp.json()} == {str(wl2.id)}
+
+
+# ── WebSocket ────────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_ws_requires_existing_wishlist(db_session):
+    from starlette.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    from app.database import get_db
+    from app.main import app
+    from tests.conftest import _override_get_db
+
+    app.dependency_overrides[get_db] = _override_get_db
+    try:
+        tc = TestClient(app)  # not as a context manager: skip lifespan
+        with pytest.raises(WebSocketDisconnect):
+            with tc.websocket_connect(f"/ws/wishlists/{uuid.uuid4()}"):
+                pass
+
+        owner = await create_test_user(db_session, email="own@ws.com")
+        wl = await create_test_wishlist(db_session, owner)
+        with tc.websocket_connect(f"/ws/wishlists/{wl.id}?delta=1") as ws:
+            assert ws.receive_json()["event"] == "hello"
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_multiplexed_ws_subscriptions(db_session):
+    from starlette.testclient import TestClient
+
+    from app.database import get_db
+    from app.main import app
+    from tests.conftest import _override_get_db
+
+    owner = await create_test_user(db_session, email="own@mux.com")
+    mine = await create_test_wishlist(db_session, owner, title="Mine")
+    friend = await create_test_user(db_session, email="fr@mux.com")
+    theirs = await create_test_wishlist(db_session, friend, title="Theirs")
+
+    app.dependency_overrides[get_db] = _override_get_db
+    try:
+        tc = TestClient(app)
+        token = create_access_token(owner.id)
+        with tc.websocket_connect(f"/ws?token={token}") as ws:
+            ws.send_json({"action": "subscribe", "wishlist_id": str(mine.id)})
+            ack = ws.receive_json()
+            assert (ack["event"], ack["wishlist_id"]) == ("subscribed", str(mine.id))
+
+            ws.send_json({"action": "subscribe", "wishlist_id": str(theirs.id)})
+            err = ws.receive_json()
+            assert err["event"] == "error" and err["wishlist_id"] == str(theirs.id)
+
+            ws.send_json({
+                "action": "subscribe", "wishlist_id": str(theirs.id), "access_token": theirs.access_token,
+            })
+            assert ws.receive_json()["event"] == "subscribed"
+
+            ws.send_json({"action": "unsubscribe", "wishlist_id": str(mine.id)})
+            assert ws.receive_json()["event"] == "unsubscribed"
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_sse_unknown_or_private_wishlist(client, db_session):
+    owner = await create_test_user(db_session, email="own@sse.com")
+    wl = await create_test_wishlist(db_session, owner)
+    wl.is_public = False
+    await db_session.commit()
+    assert (await client.get("/api/wishlists/public/nope/events")).status_code == 404
+    assert (await client.get(f"/api/wishlists/public/{wl.access_token}/events")).status_code == 404
+
+
+# ── Database engine ──────────────────────────────────
+
+
+def test_engine_options_apply_pool_settings(monkeypatch):
+    from app import database
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    url, options = database._engine_options("postgresql+asyncpg://u:p@db/wishlist")
+    assert "prepared_statement_cache_size=100" in url
+    assert options["pool_size"] == 20
+    assert options["poolclass"] is database.InstrumentedPool
+    assert options["connect_args"]["server_settings"] == {"statement_timeout": "5000"}
+
+    url, options = database._engine_options("sqlite+aiosqlite:///:memory:")
+    assert "pool_size" not in options
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_records_checkouts():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app import database
+
+    eng = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=database.InstrumentedPool)
+    before = database._pool_stats.checkouts
+    async with eng.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    await eng.dispose()
+    assert database._pool_stats.checkouts == before + 1
+
+
+@pytest.mark.asyncio
+async def test_read_routing_pins_writer_to_primary(monkeypatch):
+    from fastapi import Response
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app import database
+
+    replica_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    replica = async_sessionmaker(replica_engine, expire_on_commit=False)
+    primary = async_sessionmaker(
+        create_async_engine("sqlite+aiosqlite:///:memory:"),
+        sync_session_class=database.PrimarySession,
+        expire_on_commit=False,
+    )
+    monkeypatch.setattr(database, "replica_sessions", [replica])
+    monkeypatch.setattr(database, "async_session", primary)
+    database._primary_pins.clear()
+
+    assert database.read_sessionmaker_for("Bearer abc") is replica
+
+    async with primary() as session:
+        session.info["client_key"] = "Bearer abc"
+        await session.commit()
+    assert database.read_sessionmaker_for("Bearer abc") is primary
+    assert database.read_sessionmaker_for("Bearer other") is replica
+
+    # Another worker only sees the cookie set on the write's response
+    response = Response()
+    async with primary() as session:
+        session.info["response"] = response
+        await session.commit()
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{database.PIN_COOKIE}=")
+    pinned_at = cookie.split("=", 1)[1].split(";", 1)[0]
+    database._primary_pins.clear()
+    assert database.read_sessionmaker_for("Bearer other", pinned_at) is primary
+    assert database.read_sessionmaker_for("Bearer other", "0") is replica
+    await replica_engine.dispose()
+
+
+def test_pooler_mode_disables_statement_cache_and_keeps_url_options(monkeypatch):
+    from sqlalchemy.pool import NullPool
+
+    from app import database
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "DB_POOLER_MODE", "transaction")
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    url, options = database._engine_options(
+        "postgresql+asyncpg://u:p@pgbouncer:6432/wishlist?sslmode=require&application_name=api"
+    )
+    assert "sslmode" not in url
+    assert "prepared_statement_cache_size=0" in url
+    assert options["poolclass"] is NullPool
+    connect_args = options["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert "ssl" in connect_args
+    # application_name is kept; statement_timeout isn't sent through a pooler
+    assert connect_args["server_settings"] == {"application_name": "api"}
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+def test_libpq_url_params_become_valid_asyncpg_connect_kwargs():
+    import inspect
+
+    import asyncpg
+    from sqlalchemy import make_url
+    from sqlalchemy.dialects.postgresql.asyncpg import dialect
+
+    from app import database
+
+    url, options = database._engine_options(
+        "postgresql+asyncpg://u:p@ep-x.neon.tech/db?sslmode=require&channel_binding=require"
+        "&application_name=api&connect_timeout=7&target_session_attrs=read-write&options=endpoint%3Dep-x"
+    )
+    # What SQLAlchemy passes to asyncpg.connect(), minus the options its adapter consumes itself
+    _, kwargs = dialect().create_connect_args(make_url(url))
+    kwargs.update(options["connect_args"])
+    for key in ("prepared_statement_cache_size", "prepared_statement_name_func"):
+        kwargs.pop(key, None)
+    inspect.signature(asyncpg.connect).bind(**kwargs)  # TypeError on unknown keywords
+    assert kwargs["timeout"] == 7
+    assert kwargs["target_session_attrs"] == "read-write"
+    assert kwargs["server_settings"]["application_name"] == "api"
+    assert kwargs["server_settings"]["options"] == "endpoint=ep-x"
+    assert "channel_binding" not in kwargs
+
+
+def test_migrations_build_schema_from_empty_database(monkeypatch):
+    import io
+
+    from alembic import command
+    from alembic.config import Config
+
+    from app.config import settings
+
+    # Offline mode renders the whole chain as SQL for Postgres without a server
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql+asyncpg://u:p@localhost/wishlist")
+    out = io.StringIO()
+    config = Config(output_buffer=out)  # no ini file: env.py would reconfigure logging
+    config.set_main_option("script_location", "alembic")
+    command.upgrade(config, "head", sql=True)
+    sql = out.getvalue()
+    assert sql.index("CREATE TABLE users") < sql.index("ALTER TABLE users ADD COLUMN oauth_provider")
+    assert sql.index("CREATE TYPE itemstatus") < sql.index("ALTER TYPE itemstatus ADD VALUE")
+    assert "UPDATE alembic_version SET version_num='005_wishlist_snapshots'" in sql
+
+
+@pytest.mark.asyncio
+async def test_verify_explains_stamping_databases_built_by_create_all():
+    from app.schema import SchemaMismatch, verify
+    from tests.conftest import engine
+
+    async with engine.connect() as conn:  # tables from create_all, no alembic_version
+        with pytest.raises(SchemaMismatch, match="alembic stamp"):
+            await verify(conn)
+
+
+@pytest.mark.asyncio
+async def test_verify_never_runs_a_failing_statement():
+    from sqlalchemy import event
+
+    from app.schema import SchemaMismatch, verify
+    from tests.conftest import engine
+
+    # Postgres aborts the transaction after any error; SQLite would carry on and hide it
+    failed: list[str] = []
+
+    def aborted(conn, cursor, statement, *args):
+        if failed:
+            raise RuntimeError(f"current transaction is aborted ({failed[0]!r} failed)")
+
+    def record(context):
+        failed.append(context.statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", aborted)
+    event.listen(engine.sync_engine, "handle_error", record)
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(SchemaMismatch, match="alembic stamp"):
+                await verify(conn)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", aborted)
+        event.remove(engine.sync_engine, "handle_error", record)
+    assert failed == []
+
+
+@pytest.mark.asyncio
+async def test_schema_check_compares_alembic_version_with_head():
+    from sqlalchemy import text
+
+    from app.schema import head_revision, is_current
+    from tests.conftest import engine
+
+    assert head_revision() == "005_wishlist_snapshots"
+    async with engine.begin() as conn:
+        assert await is_current(conn) is False  # no alembic_version table
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32))"))
+        await conn.execute(text("INSERT INTO alembic_version VALUES ('002_item_filter_indexes')"))
+        assert await is_current(conn) is False
+        await conn.execute(text(f"UPDATE alembic_version SET version_num = '{head_revision()}'"))
+        assert await is_current(conn) is True
+        await conn.execute(text("DROP TABLE alembic_version"))
+
+
+@pytest.mark.asyncio
+async def test_startup_refuses_to_boot_on_schema_mismatch(monkeypatch):
+    from sqlalchemy import text
+
+    from app import main
+    from app.config import settings
+    from app.schema import SchemaMismatch, head_revision
+    from tests.conftest import engine
+
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(settings, "DB_SCHEMA_MODE", "verify")
+    with pytest.raises(SchemaMismatch, match="alembic upgrade head"):
+        async with main.lifespan(main.app):
+            pass
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32))"))
+        await conn.execute(text(f"INSERT INTO alembic_version VALUES ('{head_revision()}')"))
+    try:
+        async with main.lifespan(main.app):
+            pass
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE alembic_version"))
+
+
+@pytest.mark.asyncio
+async def test_seed_generates_consistent_dataset():
+    from sqlalchemy import func, select
+
+    from app.models import Wishlist
+    from bench.seed import Sizes, seed
+    from tests.conftest import engine
+
+    async with engine.begin() as conn:
+        counts = await seed(conn, Sizes(users=30), seed=7, chunk_size=500)
+    async with engine.connect() as conn:
+        assert counts["wishlists"] == await conn.scalar(select(func.count()).select_from(Wishlist))
+        assert counts["items"] == await conn.scalar(select(func.count()).select_from(Item))
+        assert counts["contributions"] > 0 and counts["reservations"] > 0
+        overfunded = await conn.scalar(
+            select(func.count()).select_from(
+                select(Item.id)
+                .join(Contribution, Contribution.item_id == Item.id)
+                .group_by(Item.id, Item.price_cents)
+                .having(func.sum(Contribution.amount_cents) > Item.price_cents)
+                .subquery()
+            )
+        )
+        assert overfunded == 0
+        double_reserved = await conn.scalar(
+            select(func.count()).select_from(
+                select(Reservation.item_id).group_by(Reservation.item_id)
+                .having(func.count() > 1).subquery()
+            )
+        )
+        assert double_reserved == 0
+
+
+# ── Admin profiling ──────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_admin_routes_hidden_unless_enabled(client, monkeypatch):
+    from app.config import settings
+
+    resp = await client.post("/api/admin/memory/snapshot", headers={"X-Admin-Token": "x"})
+    assert resp.status_code == 404
+
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    resp = await client.post("/api/admin/memory/snapshot", headers={"X-Admin-Token": "wrong"})
+    assert resp.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_admin_profile_captures_next_requests(monkeypatch):
+    from httpx import ASGITransport, AsyncClient
+
+    from app import profiling
+    from app.config import settings
+    from app.main import app
+
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    admin = {"X-Admin-Token": "s3cret"}
+    middleware = profiling.ProfilingMiddleware(app)
+
+    async with AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test") as ac:
+        resp = await ac.post("/api/admin/profile", json={"route": "/api/health", "requests": 2}, headers=admin)
+        assert resp.status_code == 201
+        capture_id = resp.json()["id"]
+        for _ in range(3):
+            await ac.get("/api/health")
+        resp = await ac.get(f"/api/admin/profile/{capture_id}", params={"format": "json"}, headers=admin)
+        assert resp.json()["done"] is True and resp.json()["remaining"] == 0
+        resp = await ac.get(f"/api/admin/profile/{capture_id}", headers=admin)
+        assert resp.headers["content-type"].startswith("text/plain")
+
+        resp = await ac.post("/api/admin/memory/snapshot", headers=admin)
+        assert resp.json()["tracing"] is True
+        resp = await ac.get("/api/admin/memory/diff", params={"only": "app"}, headers=admin)
+        body = resp.json()
+        assert "stats" in body and "connections" in body["ws_manager"]
+        assert "sessions" in body["orm_identity_maps"]
+        resp = await ac.delete("/api/admin/memory", headers=admin)
+        assert resp.status_code == 204
+    assert profiling.armed is None
+
+
+@pytest.mark.asyncio
+async def test_profile_capture_matches_non_get_routes(client, db_session):
+    from httpx import ASGITransport, AsyncClient
+
+    from app import profiling
+    from app.main import app
+
+    user = await create_test_user(db_session)
+    wl = await create_test_wishlist(db_session, user)
+    middleware = profiling.ProfilingMiddleware(app)
+
+    # GET /api/wishlists/{wishlist_id} is declared before PATCH on the same path
+    capture = profiling.arm("PATCH", "/api/wishlists/{wishlist_id}", requests=1, interval_s=0.001)
+    async with AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test") as ac:
+        resp = await ac.patch(f"/api/wishlists/{wl.id}", json={"title": "Renamed"}, headers=auth_header(user))
+    assert resp.status_code == 200
+    assert capture.done.is_set() and capture.remaining == 0
+    assert profiling.armed is None
+
+
+@pytest.mark.asyncio
+async def test_slow_request_log_includes_sql(client, db_session, monkeypatch, caplog):
+    from app import metrics
+    from app.main import app
+
+    user = await create_test_user(db_session)
+    wl = await create_test_wishlist(db_session, user)
+    await client.get("/api/health")  # builds the middleware stack
+
+    layer = app.middleware_stack
+    while not isinstance(layer, metrics.MetricsMiddleware):
+        layer = layer.app
+    monkeypatch.setattr(layer, "slow_request_s", 1e-6)
+    with caplog.at_level("WARNING", logger="app.metrics"):
+        await client.get(f"/api/wishlists/{wl.id}", headers=auth_header(user))
+    record = next(r for r in caplog.records if "Slow request" in r.getMessage())
+    assert "/api/wishlists/{wishlist_id}" in record.getMessage()
+    assert "SELECT" in record.getMessage()
+
+
+# ── Rate limiting ────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limited_per_ip_with_retry_after(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setitem(settings.RATE_LIMITS, "login", "ip:2/min")
+    body = {"email": "nobody@example.com", "password": "whatever"}
+    assert (await client.post("/api/auth/login", json=body)).status_code == 401
+    assert (await client.post("/api/auth/login", json=body)).status_code == 401
+    resp = await client.post("/api/auth/login", json=body)
+    assert resp.status_code == 429
+    assert 1 <= int(resp.headers["retry-after"]) <= 30
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    assert (await client.post("/api/auth/login", json=body)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_reserve_rate_limited_per_access_token(client, db_session, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setitem(settings.RATE_LIMITS, "reserve", "token:1/hour")
+    owner = await create_test_user(db_session)
+    guest = await create_test_user(db_session, email="guest@example.com", display_name="Guest")
+    wl = await create_test_wishlist(db_session, owner)
+    other = await create_test_wishlist(db_session, owner, title="Other")
+    item = await create_test_item(db_session, wl)
+    other_item = await create_test_item(db_session, other)
+
+    url = f"/api/wishlists/public/{wl.access_token}/items/{item.id}/reserve"
+    resp = await client.post(url, json={"display_name": "G"}, headers=auth_header(guest))
+    assert resp.status_code == 200
+    resp = await client.post(url, json={"display_name": "G"}, headers=auth_header(guest))
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) > 3000
+
+    # buckets are per access_token
+    url = f"/api/wishlists/public/{other.access_token}/items/{other_item.id}/reserve"
+    resp = await client.post(url, json={"display_name": "G"}, headers=auth_header(guest))
+    assert resp.status_code == 200
+
+
+def test_rate_limit_rules_parse_and_refill():
+    import asyncio
+
+    from app.ratelimit import MemoryBackend, parse_rules
+
+    rules = parse_rules("ip:10/min, user:30/hour")
+    assert [(r.scope, r.capacity) for r in rules] == [("ip", 10), ("user", 30)]
+    assert rules[0].rate == pytest.approx(10 / 60)
+    with pytest.raises(ValueError):
+        parse_rules("ip:10/fortnight")
+
+    backend = MemoryBackend()
+    rule = parse_rules("ip:2/s")[0]
+    assert asyncio.run(backend.take("k", rule)) == 0
+    assert asyncio.run(backend.take("k", rule)) == 0
+    assert 0 < asyncio.run(backend.take("k", rule)) <= 0.5
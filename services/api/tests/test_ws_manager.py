@@ -0,0 +1,247 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from app.ws_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, message: str) -> None:
+        self.sent.append(json.loads(message))
+
+
+@pytest.mark.asyncio
+async def test_coalesces_events_for_same_item():
+    mgr = ConnectionManager(coalesce_ms=20)
+    wid = uuid.uuid4()
+    ws = FakeWebSocket()
+    await mgr.connect(wid, ws)
+
+    await mgr.broadcast(wid, "item_created", "a", {"title": "v1"})
+    await mgr.broadcast(wid, "item_updated", "a", {"title": "v2"})
+    await mgr.broadcast(wid, "item_updated", "b", {"title": "b1"})
+    await mgr.broadcast(wid, "item_updated", "a", {"title": "v3"})
+    assert ws.sent == []
+
+    await asyncio.sleep(0.05)
+    # Merged events keep the position of the item's first event
+    assert [(m["event"], m["item_id"], m["data"]["title"]) for m in ws.sent] == [
+        ("item_created", "a", "v3"),
+        ("item_updated", "b", "b1"),
+    ]
+    assert mgr.stats()["events_suppressed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_multi_item_events_are_not_merged_and_flush_sends_now():
+    mgr = ConnectionManager(coalesce_ms=1000)
+    wid = uuid.uuid4()
+    ws = FakeWebSocket()
+    await mgr.connect(wid, ws)
+
+    await mgr.broadcast(wid, "items_deleted", "", {"item_ids": ["a"]})
+    await mgr.broadcast(wid, "items_deleted", "", {"item_ids": ["b"]})
+    await mgr.flush()
+    assert [m["data"]["item_ids"] for m in ws.sent] == [["a"], ["b"]]
+
+
+@pytest.mark.asyncio
+async def test_multi_item_event_is_not_overtaken_by_a_merged_update():
+    mgr = ConnectionManager(coalesce_ms=1000)
+    wid = uuid.uuid4()
+    ws = FakeWebSocket()
+    await mgr.connect(wid, ws)
+
+    await mgr.broadcast(wid, "item_updated", "a", {"title": "v1"})
+    await mgr.broadcast(wid, "items_updated", "", {"items": [{"id": "a", "title": "v2"}]})
+    await mgr.broadcast(wid, "item_updated", "a", {"title": "v3"})
+    await mgr.flush()
+    # The newest state of "a" arrives last
+    assert [m["event"] for m in ws.sent] == ["item_updated", "items_updated", "item_updated"]
+    assert ws.sent[-1]["data"]["title"] == "v3"
+
+
+@pytest.mark.asyncio
+async def test_zero_window_sends_immediately():
+    mgr = ConnectionManager(coalesce_ms=0)
+    wid = uuid.uuid4()
+    ws = FakeWebSocket()
+    await mgr.connect(wid, ws)
+    await mgr.broadcast(wid, "item_updated", "a", {})
+    assert len(ws.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_delta_sockets_get_patches_and_full_sockets_get_data():
+    mgr = ConnectionManager(coalesce_ms=0)
+    wid = uuid.uuid4()
+    full, delta = FakeWebSocket(), FakeWebSocket()
+    await mgr.connect(wid, full)
+    await mgr.connect(wid, delta, delta=True)
+
+    await mgr.broadcast(wid, "item_created", "a", {"id": "a", "title": "v1", "price_cents": 100})
+    await mgr.broadcast(wid, "item_updated", "a", {"id": "a", "title": "v2", "price_cents": 100})
+
+    assert full.sent[-1]["data"]["title"] == "v2"
+    assert delta.sent[0]["event"] == "hello"
+    assert delta.sent[-1]["patch"] == [{"op": "replace", "path": "/title", "value": "v2"}]
+    assert delta.sent[-1]["seq"] == full.sent[-1]["seq"] == full.sent[0]["seq"] + 1
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_only_missed_events():
+    mgr = ConnectionManager(coalesce_ms=0)
+    wid = uuid.uuid4()
+    first = FakeWebSocket()
+    await mgr.connect(wid, first)
+    await mgr.broadcast(wid, "item_updated", "a", {"n": 1})
+    last_seen = first.sent[-1]["seq"]
+    mgr.disconnect(wid, first)
+
+    # Events while nobody is connected are still recorded for resume
+    await mgr.broadcast(wid, "item_updated", "a", {"n": 2})
+    await mgr.broadcast(wid, "item_updated", "b", {"n": 3})
+
+    again = FakeWebSocket()
+    await mgr.connect(wid, again, since=last_seen)
+    assert [m["event"] for m in again.sent] == ["hello", "item_updated", "item_updated"]
+    assert [m["data"]["n"] for m in again.sent[1:]] == [2, 3]
+
+    stale = FakeWebSocket()
+    await mgr.connect(wid, stale, since=last_seen - 10_000)
+    assert stale.sent[-1]["event"] == "resync"
+
+
+@pytest.mark.asyncio
+async def test_recreated_history_never_reuses_sequence_numbers(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "WS_REPLAY_WISHLISTS", 1)
+    mgr = ConnectionManager(coalesce_ms=0)
+    wid, other = uuid.uuid4(), uuid.uuid4()
+    first = FakeWebSocket()
+    await mgr.connect(wid, first)
+    for n in range(5):
+        await mgr.broadcast(wid, "item_updated", "a", {"n": n})
+    last_seen = first.sent[-1]["seq"]
+    mgr.disconnect(wid, first)
+
+    await mgr.connect(other, FakeWebSocket())  # evicts wid's history
+    again = FakeWebSocket()
+    await mgr.connect(wid, again)
+    for n in range(5):
+        await mgr.broadcast(wid, "item_updated", "a", {"n": n})
+    assert again.sent[0]["seq"] > last_seen
+
+    resumed = FakeWebSocket()
+    await mgr.connect(wid, resumed, since=last_seen)
+    assert resumed.sent[-1]["event"] == "resync"
+
+
+def test_admit_enforces_per_ip_and_per_wishlist_caps(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS_PER_IP", 2)
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS_PER_WISHLIST", 3)
+    mgr = ConnectionManager(coalesce_ms=0)
+    wid = uuid.uuid4()
+
+    async def scenario():
+        sockets = [FakeWebSocket() for _ in range(3)]
+        await mgr.connect(wid, sockets[0], ip="1.1.1.1")
+        await mgr.connect(wid, sockets[1], ip="1.1.1.1")
+        assert mgr.admit(wid, "1.1.1.1") is not None
+        await mgr.connect(wid, sockets[2], ip="2.2.2.2")
+        assert mgr.admit(wid, "3.3.3.3") is not None
+
+        mgr.disconnect(wid, sockets[0])
+        mgr.disconnect(wid, sockets[0])  # double disconnect is harmless
+        assert mgr.admit(wid, "1.1.1.1") is None
+        assert mgr.stats()["connections"] == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.asyncio
+async def test_one_socket_many_subscriptions_cleans_up_in_one_call():
+    mgr = ConnectionManager(coalesce_ms=0)
+    a, b = uuid.uuid4(), uuid.uuid4()
+    ws = FakeWebSocket()
+    await mgr.accept(ws, ip="1.1.1.1")
+    await mgr.subscribe(a, ws, ack="subscribed")
+    await mgr.subscribe(b, ws, ack="subscribed")
+
+    await mgr.broadcast(a, "item_updated", "x", {"n": 1})
+    await mgr.broadcast(b, "item_updated", "y", {"n": 2})
+    assert [(m["event"], m["wishlist_id"]) for m in ws.sent] == [
+        ("subscribed", str(a)), ("subscribed", str(b)),
+        ("item_updated", str(a)), ("item_updated", str(b)),
+    ]
+
+    mgr.disconnect_all(ws)
+    assert mgr.stats()["connections"] == 0
+    assert mgr.stats()["client_ips"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_resumes_from_last_event_id(monkeypatch):
+    from app.routes import events
+
+    mgr = ConnectionManager(coalesce_ms=0)
+    monkeypatch.setattr(events, "manager", mgr)
+    wid = uuid.uuid4()
+    viewer = FakeWebSocket()
+    await mgr.connect(wid, viewer)
+    await mgr.broadcast(wid, "item_updated", "a", {"n": 1})
+    await mgr.broadcast(wid, "item_updated", "a", {"n": 2})
+    first_seq = viewer.sent[0]["seq"]
+
+    class FakeRequest:
+        async def is_disconnected(self) -> bool:
+            return False
+
+    subscriber = events.QueueSubscriber()
+    await mgr.accept(subscriber)
+    await mgr.subscribe(wid, subscriber, since=first_seq, ack="hello")
+    stream = events._event_stream(FakeRequest(), subscriber)
+
+    assert await anext(stream) == "retry: 3000\n\n"
+    assert (await anext(stream)).startswith("id: ")  # hello
+    frame = await anext(stream)
+    assert frame.startswith(f"id: {first_seq + 1}\nevent: item_updated\ndata: ")
+    assert json.loads(frame.split("data: ", 1)[1])["data"] == {"n": 2}
+
+    await stream.aclose()
+    assert mgr.stats()["connections"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_ends_when_subscriber_falls_behind(monkeypatch):
+    from app.routes import events
+
+    mgr = ConnectionManager(coalesce_ms=0)
+    monkeypatch.setattr(events, "manager", mgr)
+    wid = uuid.uuid4()
+
+    class FakeRequest:
+        async def is_disconnected(self) -> bool:
+            return False
+
+    subscriber = events.QueueSubscriber(maxsize=1)
+    await mgr.accept(subscriber)
+    await mgr.subscribe(wid, subscriber, ack="hello")  # fills the queue
+    await mgr.broadcast(wid, "item_updated", "a", {"n": 1})
+    assert subscriber.dropped
+
+    stream = events._event_stream(FakeRequest(), subscriber)
+    assert await anext(stream) == "retry: 3000\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)